@@ -9,6 +9,171 @@ from CatLink import LavalinkClient, LavalinkVoiceClient
 from CatLink.models import Track
 from typing import List
 
+
+class PanelState:
+    __slots__ = ("track_id", "interval", "next_due", "signature", "last_interaction")
+
+    def __init__(self, track_id: str | None, now: float, interval: float):
+        self.track_id = track_id
+        self.interval = interval
+        self.next_due = now + self.interval
+        self.signature = None
+        self.last_interaction = 0.0
+
+
+class PanelScheduler:
+    """
+    所有 guild 的正在播放面板共用一個 task：
+    內容沒變就不編輯，更新間隔依歌曲長度調整 (進度條約每格更新一次)，
+    碰到 429 或編輯變慢就拉長間隔；剛被操作過的面板優先，每個 tick 的編輯數有上限。
+    """
+
+    def __init__(self, cog: "MusicCog", tick: float = 1.0, edits_per_tick: int = 4,
+                 min_interval: float = 5.0, max_interval: float = 30.0, priority_window: float = 60.0):
+        self.cog = cog
+        self.tick = tick
+        self.edits_per_tick = edits_per_tick
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.priority_window = priority_window
+        self._panels: dict[int, PanelState] = {}
+        self._task: asyncio.Task | None = None
+        self._blocked_until = 0.0
+        self.pressure = 1.0
+        self.edits = 0
+        self.skipped = 0
+        self.deferred = 0
+
+    def _now(self) -> float:
+        return asyncio.get_running_loop().time()
+
+    def add(self, guild_id: int):
+        track_id = self.cog._panel_track_id.get(guild_id)
+        state = self._panels.get(guild_id)
+        if state is None or state.track_id != track_id:
+            self._panels[guild_id] = PanelState(track_id, self._now(), self.min_interval)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def touch(self, guild_id: int):
+        state = self._panels.get(guild_id)
+        if state is None:
+            return
+        now = self._now()
+        state.last_interaction = now
+        state.next_due = min(state.next_due, now + self.tick)
+
+    def discard(self, guild_id: int):
+        self._panels.pop(guild_id, None)
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._panels.clear()
+
+    def _interval_for(self, player) -> float:
+        track = getattr(player, 'current', None)
+        length = getattr(track, 'length', 0) or 0
+        if getattr(player, 'paused', False) or getattr(track, 'is_stream', False) or not length:
+            return self.max_interval
+        # 進度條寬 20 格，約每走一格更新一次
+        interval = length / 1000 / 20
+        return max(self.min_interval, min(self.max_interval, interval * self.pressure))
+
+    async def _run(self):
+        try:
+            while self._panels:
+                await asyncio.sleep(self.tick)
+                now = self._now()
+                if now < self._blocked_until:
+                    continue
+                due = [(gid, st) for gid, st in self._panels.items() if st.next_due <= now]
+                if not due:
+                    self.pressure = max(1.0, self.pressure * 0.9)
+                    continue
+                # 最近被操作的優先，其餘依逾期時間排序
+                due.sort(key=lambda item: (now - item[1].last_interaction > self.priority_window, item[1].next_due))
+                batch = due[:self.edits_per_tick]
+                if len(due) > len(batch):
+                    self.deferred += len(due) - len(batch)
+                    self.pressure = min(4.0, max(self.pressure, len(due) / self.edits_per_tick))
+                else:
+                    self.pressure = max(1.0, self.pressure * 0.9)
+                await asyncio.gather(*(self._refresh_guarded(gid, st) for gid, st in batch))
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self.cog._log.warning(f"[NP] panel scheduler stopped: {e}")
+        finally:
+            self._task = None
+
+    async def _refresh_guarded(self, guild_id: int, state: PanelState):
+        # 單一 guild 出錯只影響它自己，排到最長間隔後再試，不讓排程器整個停掉
+        try:
+            await self._refresh(guild_id, state)
+        except Exception as e:
+            self.cog._log.warning(f"[NP] panel refresh failed (guild={guild_id}): {e}")
+            state.next_due = self._now() + self.max_interval
+
+    async def _refresh(self, guild_id: int, state: PanelState):
+        cog = self.cog
+        player = cog.lavalink.peek_player(guild_id)
+        current = getattr(player, 'current', None)
+        if not current:
+            self.discard(guild_id)
+            return
+        current_id = getattr(current, 'identifier', None)
+        if state.track_id and current_id and current_id != state.track_id:
+            self.discard(guild_id)
+            return
+        loop_time = self._now()
+        state.interval = self._interval_for(player)
+        state.next_due = loop_time + state.interval
+        msg = cog._panel_message.get(guild_id)
+        if not msg:
+            return
+        embed = cog._build_nowplaying_embed(guild_id)
+        if not embed:
+            self.discard(guild_id)
+            return
+        signature = (embed.description, tuple((f.name, f.value) for f in embed.fields))
+        if signature == state.signature:
+            self.skipped += 1
+            return
+        started = loop_time
+        try:
+            await msg.edit(embed=embed)
+        except discord.RateLimited as e:
+            self._blocked_until = self._now() + e.retry_after
+            self.pressure = 4.0
+            return
+        except discord.HTTPException as e:
+            if e.status == 429:
+                retry_after = float(getattr(e, 'retry_after', 0) or self.max_interval)
+                self._blocked_until = self._now() + retry_after
+                self.pressure = 4.0
+                return
+            if e.status != 404:
+                return
+            try:
+                real = await msg.channel.fetch_message(msg.id)
+                cog._panel_message[guild_id] = real
+                await real.edit(embed=embed)
+            except Exception:
+                self.discard(guild_id)
+                return
+        except Exception:
+            self.discard(guild_id)
+            return
+        self.edits += 1
+        state.signature = signature
+        # discord.py 在 bucket 用完時會先等待再送出，編輯明顯變慢就把這個面板放慢
+        if self._now() - started > 1.0:
+            state.interval = min(self.max_interval, state.interval * 2)
+            state.next_due = self._now() + state.interval
+
+
 class MusicCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
@@ -17,8 +182,8 @@ class MusicCog(commands.Cog):
         self._last_track_id: dict[int, str] = {}
         self._suppress_next_post: set[int] = set()
         self._panel_message: dict[int, discord.Message] = {}
-        self._update_tasks: dict[int, asyncio.Task] = {}
         self._panel_track_id: dict[int, str] = {}
+        self._panels = PanelScheduler(self)
         try:
             self.bot.lavalink.on("track_start")(self._on_track_start)
         except Exception:
@@ -28,6 +193,9 @@ class MusicCog(commands.Cog):
     def lavalink(self) -> LavalinkClient:
         return self.bot.lavalink
 
+    async def cog_unload(self):
+        self._panels.close()
+
     def create_embed(self, title: str, description: str, color=discord.Color.blue()):
         embed = discord.Embed(title=title, description=description, color=color)
         embed.set_footer(text="Powered by CatLink")
@@ -69,7 +237,7 @@ class MusicCog(commands.Cog):
         return f"{self._format_time(pos_ms)} ┃{bar}┃ {self._format_time(total_ms)}"
 
     def _build_nowplaying_embed(self, guild_id: int) -> discord.Embed | None:
-        player = self.lavalink.get_player(guild_id)
+        player = self.lavalink.peek_player(guild_id)
         track = getattr(player, 'current', None)
         if not track:
             return None
@@ -98,9 +266,7 @@ class MusicCog(commands.Cog):
         return embed
 
     def _ensure_updater(self, guild_id: int):
-        if guild_id in self._update_tasks and not self._update_tasks[guild_id].done():
-            return
-        self._update_tasks[guild_id] = asyncio.create_task(self._updater_loop(guild_id))
+        self._panels.add(guild_id)
 
     def _find_fallback_text_channel(self, guild_id: int) -> int | None:
         guild = self.bot.get_guild(guild_id)
@@ -112,38 +278,6 @@ class MusicCog(commands.Cog):
                 return ch.id
         return None
 
-    async def _updater_loop(self, guild_id: int):
-        try:
-            while True:
-                await asyncio.sleep(3)
-                player = self.lavalink.get_player(guild_id)
-                if not getattr(player, 'current', None):
-                    break
-                current_id = getattr(getattr(player, 'current', None), 'identifier', None)
-                bound_id = self._panel_track_id.get(guild_id)
-                if bound_id and current_id and current_id != bound_id:
-                    break
-                msg = self._panel_message.get(guild_id)
-                if not msg:
-                    continue
-                embed = self._build_nowplaying_embed(guild_id)
-                if not embed:
-                    break
-                try:
-                    await msg.edit(embed=embed)
-                except Exception:
-                    try:
-                        ch = msg.channel or self.bot.get_channel(msg.channel.id)
-                        real = await ch.fetch_message(msg.id)
-                        self._panel_message[guild_id] = real
-                        await real.edit(embed=embed)
-                    except Exception:
-                        break
-        finally:
-            task = self._update_tasks.get(guild_id)
-            if task:
-                self._update_tasks.pop(guild_id, None)
-
     @app_commands.command(name="play", description="播放音樂(根據你的岩漿插件件)")
     @app_commands.describe(query="歌曲名稱或網址")
     async def play(self, interaction: discord.Interaction, query: str):
@@ -223,8 +357,8 @@ class MusicCog(commands.Cog):
 
     @app_commands.command(name="skip", description="跳過當前歌曲")
     async def skip(self, interaction: discord.Interaction):
-        player = self.lavalink.get_player(interaction.guild_id)
-        if not player.is_playing and not player.queue:
+        player = self.lavalink.peek_player(interaction.guild_id)
+        if player is None or (not player.is_playing and not player.queue):
             return await interaction.response.send_message("現在沒有在播放或待播的歌曲。", ephemeral=True)
 
         await player.skip()
@@ -234,36 +368,41 @@ class MusicCog(commands.Cog):
 
     @app_commands.command(name="stop", description="停止播放並清空隊列")
     async def stop(self, interaction: discord.Interaction):
-        player = self.lavalink.get_player(interaction.guild_id)
-        
-        await player.stop()
-        player.queue.clear()
+        # 節點重連中時 stop 可能要等一陣子，先回應避免 interaction 逾時
+        await interaction.response.defer()
+        player = self.lavalink.peek_player(interaction.guild_id)
+        if player is not None:
+            await player.stop()
+            player.queue.clear()
         
 
         if interaction.guild.voice_client:
             await interaction.guild.voice_client.disconnect()
         self._panel_message.pop(interaction.guild_id, None)
         self._panel_track_id.pop(interaction.guild_id, None)
-        task = self._update_tasks.get(interaction.guild_id)
-        if task:
-            task.cancel()
-            self._update_tasks.pop(interaction.guild_id, None)
+        self._panels.discard(interaction.guild_id)
             
-        await interaction.response.send_message(
+        await interaction.followup.send(
             embed=self.create_embed("⏹️ 停止", "已停止播放並斷開連線。", discord.Color.red())
         )
 
     @app_commands.command(name="pause", description="暫停播放")
     async def pause(self, interaction: discord.Interaction):
-        player = self.lavalink.get_player(interaction.guild_id)
+        player = self.lavalink.peek_player(interaction.guild_id)
+        if player is None or not player.current:
+            return await interaction.response.send_message("目前沒有播放。", ephemeral=True)
+        await interaction.response.defer(ephemeral=True)
         await player.pause()
-        await interaction.response.send_message("⏸️ 已暫停。", ephemeral=True)
+        await interaction.followup.send("⏸️ 已暫停。", ephemeral=True)
 
     @app_commands.command(name="resume", description="恢復播放")
     async def resume(self, interaction: discord.Interaction):
-        player = self.lavalink.get_player(interaction.guild_id)
+        player = self.lavalink.peek_player(interaction.guild_id)
+        if player is None or not player.current:
+            return await interaction.response.send_message("目前沒有播放。", ephemeral=True)
+        await interaction.response.defer(ephemeral=True)
         await player.resume()
-        await interaction.response.send_message("▶️ 已恢復。", ephemeral=True)
+        await interaction.followup.send("▶️ 已恢復。", ephemeral=True)
 
     @app_commands.command(name="loop", description="切換單曲循環")
     async def loop(self, interaction: discord.Interaction):
@@ -273,8 +412,8 @@ class MusicCog(commands.Cog):
 
     @app_commands.command(name="nowplaying", description="顯示現在播放並附控制")
     async def nowplaying(self, interaction: discord.Interaction):
-        player = self.lavalink.get_player(interaction.guild_id)
-        if not player.current:
+        player = self.lavalink.peek_player(interaction.guild_id)
+        if player is None or not player.current:
             return await interaction.response.send_message("目前沒有播放。", ephemeral=True)
         embed = self._build_nowplaying_embed(interaction.guild_id)
         if not embed:
@@ -293,8 +432,8 @@ class MusicCog(commands.Cog):
 
     @app_commands.command(name="queue", description="查看播放清單")
     async def queue(self, interaction: discord.Interaction):
-        player = self.lavalink.get_player(interaction.guild_id)
-        if not player.queue and not player.current:
+        player = self.lavalink.peek_player(interaction.guild_id)
+        if player is None or (not player.queue and not player.current):
             return await interaction.response.send_message("播放清單是空的。", ephemeral=True)
 
         view = QueueLayoutView(self.bot, interaction.guild_id)
@@ -302,13 +441,15 @@ class MusicCog(commands.Cog):
 
     @app_commands.command(name="volume", description="調整音量 (0-1000)")
     async def volume(self, interaction: discord.Interaction, level: int):
-        player = self.lavalink.get_player(interaction.guild_id)
         if level < 0 or level > 1000:
             return await interaction.response.send_message("音量必須在 0 到 1000 之間。", ephemeral=True)
+        # 還沒播放時也可以先設定音量，所以這裡要建立 player
+        player = self.lavalink.get_player(interaction.guild_id)
 
+        await interaction.response.defer()
         await player.set_volume(level)
         
-        await interaction.response.send_message(f"🔊 音量已設定為 {level}%")
+        await interaction.followup.send(f"🔊 音量已設定為 {level}%")
 
 
     async def _on_track_start(self, event):
@@ -326,7 +467,7 @@ class MusicCog(commands.Cog):
             self._log.info(f"[NP] no channel recorded for guild={guild_id}, skip")
             return
 
-        player = self.lavalink.get_player(guild_id)
+        player = self.lavalink.peek_player(guild_id)
         track = getattr(player, 'current', None)
         if not track:
             self._log.info(f"[NP] no current track for guild={guild_id}, skip")
@@ -381,6 +522,10 @@ class PlayerControlsView(discord.ui.View):
 
     def _player(self, interaction: discord.Interaction | None = None):
         gid = interaction.guild_id if interaction else self.guild_id
+        if interaction is not None:
+            cog = self.bot.get_cog("MusicCog")
+            if isinstance(cog, MusicCog):
+                cog._panels.touch(gid)
         return self.bot.lavalink.get_player(gid)
 
     def _apply_state(self):
@@ -398,39 +543,39 @@ class PlayerControlsView(discord.ui.View):
     @discord.ui.button(label="⏯ 暫停/播放", style=discord.ButtonStyle.primary)
     async def toggle_pause(self, interaction: discord.Interaction, button: discord.ui.Button):
         player = self._player(interaction)
+        await interaction.response.edit_message(view=self)
         if getattr(player, 'paused', False):
             await player.resume()
         else:
             await player.pause()
-        await interaction.response.edit_message(view=self)
 
     @discord.ui.button(label="⏭ 跳過", style=discord.ButtonStyle.secondary)
     async def skip(self, interaction: discord.Interaction, button: discord.ui.Button):
         player = self._player(interaction)
-        await player.skip()
         await interaction.response.defer()
+        await player.skip()
 
     @discord.ui.button(label="⏹ 停止", style=discord.ButtonStyle.danger)
     async def stop(self, interaction: discord.Interaction, button: discord.ui.Button):
         player = self._player(interaction)
+        await interaction.response.defer()
         await player.stop()
         if interaction.guild.voice_client:
             await interaction.guild.voice_client.disconnect()
-        await interaction.response.defer()
 
     @discord.ui.button(label="🔉 -10", style=discord.ButtonStyle.secondary)
     async def vol_down(self, interaction: discord.Interaction, button: discord.ui.Button):
         player = self._player(interaction)
         cur = getattr(player, 'volume', 100) or 100
-        await player.set_volume(max(0, cur - 10))
         await interaction.response.defer()
+        await player.set_volume(max(0, cur - 10))
 
     @discord.ui.button(label="🔊 +10", style=discord.ButtonStyle.secondary)
     async def vol_up(self, interaction: discord.Interaction, button: discord.ui.Button):
         player = self._player(interaction)
         cur = getattr(player, 'volume', 100) or 100
-        await player.set_volume(min(1000, cur + 10))
         await interaction.response.defer()
+        await player.set_volume(min(1000, cur + 10))
 
     @discord.ui.button(label="🔁 循環：關", style=discord.ButtonStyle.secondary)
     async def loop(self, interaction: discord.Interaction, button: discord.ui.Button):
@@ -556,14 +701,13 @@ class QueueLayoutView(LayoutView):
 
     def _snapshot(self) -> dict:
         player = self._player()
-        queue_list = list(player.queue)
-        total = len(queue_list)
+        total = len(player.queue)
         page_count = max(1, (total + self.per_page - 1) // self.per_page)
         self.page = max(0, min(self.page, page_count - 1))
         start = self.page * self.per_page
         end = min(start + self.per_page, total)
-        shown = queue_list[start:end]
-        return {"player": player, "queue": queue_list, "total": total, "shown": shown, "start": start, "page_count": page_count}
+        shown = player.queue.window(start, end)
+        return {"player": player, "total": total, "shown": shown, "start": start, "page_count": page_count}
 
     def _build_text_block(self, snap: dict) -> str:
         player = snap["player"]
@@ -647,17 +791,10 @@ class QueueLayoutView(LayoutView):
 
     async def remove_track(self, interaction: discord.Interaction, index: int):
         player = self._player()
-        queue_list = list(player.queue)
         removed = False
-        target = None
-        if 1 <= index <= len(queue_list):
-            target = queue_list[index - 1]
-        if target is not None:
-            try:
-                player.queue.remove(target)
-                removed = True
-            except Exception:
-                removed = False
+        if 1 <= index <= len(player.queue):
+            player.queue.pop(index - 1)
+            removed = True
 
         snap = self._snapshot()
         self._build_layout(snap)
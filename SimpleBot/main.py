@@ -2,7 +2,7 @@ import discord
 import SimpleBot.config as config
 import logging
 from discord.ext import commands
-from CatLink import LavalinkClient
+from CatLink import LavalinkClient, FileSessionStore
 
 logging.basicConfig(level=logging.INFO)
 
@@ -26,7 +26,8 @@ class MusicBot(commands.Bot):
             port=config.LAVALINK_PORT,
             password=config.LAVALINK_PASSWORD,
             user_id=self.application_id,
-            version=4 #lavalink version
+            version=4, #lavalink version
+            session_store=FileSessionStore("catlink_session.json")
         )
         try:
             await self.load_extension("cogs.music")
@@ -39,14 +40,20 @@ class MusicBot(commands.Bot):
     async def on_ready(self):
         print(f"Login in: {self.user} (ID: {self.user.id})")
         
-        self.lavalink.node.user_id = self.user.id
-        if hasattr(self.lavalink, "rest") and hasattr(self.lavalink.rest, "headers"):
-            self.lavalink.rest.headers["User-Id"] = str(self.user.id)
+        self.lavalink.user_id = self.user.id
+        for node in self.lavalink.nodes:
+            node.user_id = self.user.id
+            node.rest.headers["User-Id"] = str(self.user.id)
         
 
         await self.lavalink.connect()
         print("Lavalink connecteing...")
 
+    async def close(self):
+        if self.lavalink:
+            await self.lavalink.close()
+        await super().close()
+
 if __name__ == "__main__":
     bot = MusicBot()
     bot.run(config.TOKEN)
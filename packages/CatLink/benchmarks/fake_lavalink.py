@@ -0,0 +1,350 @@
+"""
+本機用的假 Lavalink 節點 (v3 / v4)，給 benchmark 與壓力測試使用。
+
+支援 loadtracks、session / player PATCH 與 DELETE，以及 WebSocket 的
+ready / playerUpdate / event / stats。延遲、抖動與失敗率都可以調整。
+"""
+import asyncio
+import base64
+import json
+import random
+import struct
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set
+
+from aiohttp import web
+
+
+def _utf(value: str) -> bytes:
+    raw = value.encode("utf-8")
+    return struct.pack(">H", len(raw)) + raw
+
+
+def _nullable(value: Optional[str]) -> bytes:
+    return b"\x00" if value is None else b"\x01" + _utf(value)
+
+
+def encode_track(title: str, author: str, length: int, identifier: str, uri: Optional[str] = None, source: str = "youtube", is_stream: bool = False) -> str:
+    # Lavaplayer 的 track message v3 格式，CatLink 的本地解碼器可以直接讀
+    body = (
+        bytes([3])
+        + _utf(title)
+        + _utf(author)
+        + struct.pack(">q", length)
+        + _utf(identifier)
+        + (b"\x01" if is_stream else b"\x00")
+        + _nullable(uri)
+        + _nullable(None)
+        + _nullable(None)
+        + _utf(source)
+        + struct.pack(">q", 0)
+    )
+    return base64.b64encode(struct.pack(">i", (1 << 30) | len(body)) + body).decode("ascii")
+
+
+@dataclass
+class FakeConfig:
+    version: int = 4
+    latency: float = 0.0            # REST 回應延遲 (秒)
+    jitter: float = 0.0             # 額外的隨機延遲上限 (秒)
+    failure_rate: float = 0.0       # REST 回傳 500 的機率
+    start_delay: float = 0.005      # 收到播放請求到送出 TrackStartEvent
+    track_length: int = 180_000     # 產生的曲目長度 (ms)
+    track_seconds: Optional[float] = None  # 實際多久後送出 TrackEndEvent，None 表示不自動結束
+    update_interval: float = 5.0    # playerUpdate 間隔
+    stats_interval: float = 60.0
+    search_results: int = 5
+
+
+@dataclass
+class FakePlayer:
+    guild_id: str
+    track: Optional[Dict[str, Any]] = None
+    paused: bool = False
+    volume: int = 100
+    position: int = 0
+    started: float = 0.0
+    voice: Optional[Dict[str, Any]] = None
+    end_task: Optional[asyncio.Task] = None
+
+
+class FakeLavalink:
+    def __init__(self, config: Optional[FakeConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or FakeConfig()
+        self.host = host
+        self.port = port
+        self.players: Dict[str, FakePlayer] = {}
+        self.sockets: Set[web.WebSocketResponse] = set()
+        self.session_id = "fake-session"
+        self.requests: Dict[str, int] = {}
+        self.failures = 0
+        self._runner: Optional[web.AppRunner] = None
+        self._tasks: List[asyncio.Task] = []
+
+    # 啟動 / 關閉
+
+    def _app(self) -> web.Application:
+        app = web.Application()
+        r = app.router
+        r.add_get("/version", self._version)
+        if self.config.version == 4:
+            r.add_get("/v4/loadtracks", self._loadtracks)
+            r.add_patch("/v4/sessions/{sid}", self._update_session)
+            r.add_patch("/v4/sessions/{sid}/players/{gid}", self._update_player)
+            r.add_delete("/v4/sessions/{sid}/players/{gid}", self._destroy_player)
+            r.add_get("/v4/websocket", self._websocket)
+        else:
+            r.add_get("/loadtracks", self._loadtracks)
+            r.add_get("/v3/loadtracks", self._loadtracks)
+            r.add_get("/v3/websocket", self._websocket)
+        return app
+
+    async def start(self) -> int:
+        self._runner = web.AppRunner(self._app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._update_loop()), loop.create_task(self._stats_loop())]
+        return self.port
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        for player in self.players.values():
+            if player.end_task:
+                player.end_task.cancel()
+        for ws in list(self.sockets):
+            await ws.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    # REST
+
+    async def _delay_or_fail(self, name: str) -> Optional[web.Response]:
+        self.requests[name] = self.requests.get(name, 0) + 1
+        cfg = self.config
+        delay = cfg.latency + (random.uniform(0, cfg.jitter) if cfg.jitter else 0.0)
+        if delay:
+            await asyncio.sleep(delay)
+        if cfg.failure_rate and random.random() < cfg.failure_rate:
+            self.failures += 1
+            return web.json_response({"status": 500, "error": "Internal Server Error", "message": "injected failure"}, status=500)
+        return None
+
+    async def _version(self, request: web.Request) -> web.Response:
+        return web.Response(text="4.0.0" if self.config.version == 4 else "3.7.0")
+
+    def _make_track(self, query: str, index: int) -> Dict[str, Any]:
+        identifier = f"{abs(hash(query)) % 10**10:010d}{index}"
+        title = f"{query} #{index}"
+        uri = f"https://www.youtube.com/watch?v={identifier}"
+        info = {
+            "identifier": identifier,
+            "isSeekable": True,
+            "author": "Fake Artist",
+            "length": self.config.track_length,
+            "isStream": False,
+            "position": 0,
+            "title": title,
+            "uri": uri,
+            "sourceName": "youtube",
+            "artworkUrl": None,
+            "isrc": None,
+        }
+        encoded = encode_track(title, info["author"], info["length"], identifier, uri)
+        if self.config.version == 4:
+            return {"encoded": encoded, "info": info, "pluginInfo": {}, "userData": {}}
+        return {"track": encoded, "info": info}
+
+    async def _loadtracks(self, request: web.Request) -> web.Response:
+        failed = await self._delay_or_fail("loadtracks")
+        if failed is not None:
+            return failed
+        identifier = request.query.get("identifier", "")
+        if "notfound" in identifier:
+            if self.config.version == 4:
+                return web.json_response({"loadType": "empty", "data": {}})
+            return web.json_response({"loadType": "NO_MATCHES", "tracks": []})
+        is_search = ":" in identifier and not identifier.startswith("http")
+        count = self.config.search_results if is_search else 1
+        tracks = [self._make_track(identifier, i) for i in range(count)]
+        if self.config.version == 4:
+            if is_search:
+                return web.json_response({"loadType": "search", "data": tracks})
+            return web.json_response({"loadType": "track", "data": tracks[0]})
+        return web.json_response({"loadType": "SEARCH_RESULT" if is_search else "TRACK_LOADED", "tracks": tracks})
+
+    async def _update_session(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        return web.json_response({"resuming": body.get("resuming", False), "timeout": body.get("timeout", 60)})
+
+    async def _update_player(self, request: web.Request) -> web.Response:
+        failed = await self._delay_or_fail("update_player")
+        if failed is not None:
+            return failed
+        gid = request.match_info["gid"]
+        body = await request.json()
+        player = self.players.get(gid) or self.players.setdefault(gid, FakePlayer(gid))
+        if "voice" in body:
+            player.voice = body["voice"]
+        if "volume" in body:
+            player.volume = body["volume"]
+        if "paused" in body:
+            player.paused = body["paused"]
+        if "position" in body:
+            player.position = body["position"]
+            player.started = time.monotonic()
+        track = body.get("track")
+        if track is not None:
+            encoded = track.get("encoded")
+            no_replace = request.query.get("noReplace") == "true"
+            if encoded is None:
+                self._end(player, "stopped")
+            elif not (no_replace and player.track is not None):
+                self._begin(player, encoded)
+        return web.json_response(self._player_json(player))
+
+    async def _destroy_player(self, request: web.Request) -> web.Response:
+        player = self.players.pop(request.match_info["gid"], None)
+        if player is not None and player.end_task:
+            player.end_task.cancel()
+        return web.Response(status=204)
+
+    def _player_json(self, player: FakePlayer) -> Dict[str, Any]:
+        return {
+            "guildId": player.guild_id,
+            "track": player.track,
+            "volume": player.volume,
+            "paused": player.paused,
+            "state": {"time": int(time.time() * 1000), "position": self._position(player), "connected": True, "ping": 1},
+            "voice": player.voice or {},
+            "filters": {},
+        }
+
+    # 播放狀態
+
+    def _position(self, player: FakePlayer) -> int:
+        if player.track is None:
+            return 0
+        if player.paused:
+            return player.position
+        return player.position + int((time.monotonic() - player.started) * 1000)
+
+    def _event_track(self, player: FakePlayer) -> Any:
+        if self.config.version == 4:
+            return player.track
+        return player.track["encoded"]
+
+    def _begin(self, player: FakePlayer, encoded: str):
+        if player.track is not None:
+            self._end(player, "replaced")
+        player.track = {"encoded": encoded, "info": {}}
+        player.position = 0
+        player.started = time.monotonic()
+        player.paused = False
+        asyncio.get_running_loop().call_later(self.config.start_delay, self._send_start, player, player.track)
+        if self.config.track_seconds is not None:
+            player.end_task = asyncio.get_running_loop().create_task(self._finish_later(player, player.track))
+
+    def _send_start(self, player: FakePlayer, track: Dict[str, Any]):
+        if player.track is track:
+            self._broadcast({"op": "event", "type": "TrackStartEvent", "guildId": player.guild_id, "track": self._event_track(player)})
+
+    async def _finish_later(self, player: FakePlayer, track: Dict[str, Any]):
+        await asyncio.sleep(self.config.track_seconds)
+        if player.track is track:
+            self._end(player, "finished")
+
+    def _end(self, player: FakePlayer, reason: str):
+        if player.track is None:
+            return
+        if player.end_task is not None and player.end_task is not asyncio.current_task():
+            player.end_task.cancel()
+        player.end_task = None
+        payload = {"op": "event", "type": "TrackEndEvent", "guildId": player.guild_id, "track": self._event_track(player), "reason": reason}
+        player.track = None
+        self._broadcast(payload)
+
+    # WebSocket
+
+    async def _websocket(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        self.sockets.add(ws)
+        resumed = request.headers.get("Session-Id") == self.session_id
+        await ws.send_str(json.dumps({"op": "ready", "resumed": resumed, "sessionId": self.session_id}))
+        try:
+            async for msg in ws:
+                if msg.type == web.WSMsgType.TEXT and self.config.version != 4:
+                    self._handle_v3(json.loads(msg.data))
+        finally:
+            self.sockets.discard(ws)
+        return ws
+
+    def _handle_v3(self, data: Dict[str, Any]):
+        op = data.get("op")
+        gid = data.get("guildId")
+        if gid is None:
+            return
+        player = self.players.get(gid) or self.players.setdefault(gid, FakePlayer(gid))
+        if op == "play":
+            if not (data.get("noReplace") and player.track is not None):
+                self._begin(player, data["track"])
+        elif op == "stop":
+            self._end(player, "stopped")
+        elif op == "destroy":
+            self._end(player, "cleanup")
+            self.players.pop(gid, None)
+        elif op == "pause":
+            player.position = self._position(player)
+            player.started = time.monotonic()
+            player.paused = bool(data.get("pause"))
+        elif op == "volume":
+            player.volume = data.get("volume", 100)
+        elif op == "seek":
+            player.position = data.get("position", 0)
+            player.started = time.monotonic()
+        elif op == "voiceUpdate":
+            player.voice = data
+
+    def _broadcast(self, payload: Dict[str, Any]):
+        data = json.dumps(payload)
+        for ws in list(self.sockets):
+            if not ws.closed:
+                asyncio.ensure_future(ws.send_str(data))
+
+    def send_player_update(self, guild_id: str):
+        player = self.players.get(guild_id) or FakePlayer(guild_id)
+        self._broadcast({
+            "op": "playerUpdate",
+            "guildId": guild_id,
+            "state": {"time": int(time.time() * 1000), "position": self._position(player), "connected": True, "ping": 1},
+        })
+
+    async def _update_loop(self):
+        while True:
+            await asyncio.sleep(self.config.update_interval)
+            for gid, player in list(self.players.items()):
+                if player.track is not None:
+                    self.send_player_update(gid)
+
+    def stats_payload(self) -> Dict[str, Any]:
+        playing = sum(1 for p in self.players.values() if p.track is not None)
+        return {
+            "op": "stats",
+            "players": len(self.players),
+            "playingPlayers": playing,
+            "uptime": 1000,
+            "memory": {"free": 1 << 28, "used": 1 << 28, "allocated": 1 << 29, "reservable": 1 << 30},
+            "cpu": {"cores": 4, "systemLoad": 0.1, "lavalinkLoad": 0.05},
+            "frameStats": {"sent": 3000, "nulled": 0, "deficit": 0},
+        }
+
+    async def _stats_loop(self):
+        while True:
+            await asyncio.sleep(self.config.stats_interval)
+            self._broadcast(self.stats_payload())
@@ -0,0 +1,282 @@
+"""
+CatLink benchmark：對本機假節點量測播放延遲、搜尋吞吐、事件分派吞吐與每個 player 的記憶體。
+
+    pip install -e .
+    python benchmarks/run.py --version 4 --output results.json
+    python benchmarks/run.py --version 4 --compare results.json
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+from CatLink import LavalinkClient
+from CatLink.websocket import ConnectionState
+
+from fake_lavalink import FakeConfig, FakeLavalink
+
+# 數值越大越好的指標，其餘視為越小越好
+HIGHER_IS_BETTER = {"search_per_sec", "events_per_sec"}
+
+
+class _User:
+    id = 1
+
+
+class StubBot:
+    """只提供 CatLink 會用到的部分：add_listener、user 與 loop。"""
+
+    def __init__(self):
+        self.user = _User()
+        self.loop = asyncio.get_running_loop()
+        self.listeners: List[Any] = []
+
+    def add_listener(self, func, name: str):
+        self.listeners.append((name, func))
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def _make_client(fake: FakeLavalink, version: int) -> LavalinkClient:
+    client = LavalinkClient(StubBot(), "127.0.0.1", fake.port, "youshallnotpass", user_id=1, version=version, prefetch_count=0, idle_timeout=None)
+    await client.connect()
+    if not await client.node.wait_ready(timeout=5.0):
+        raise RuntimeError("fake node did not become ready")
+    # v3 的 ws 連上後才算可用
+    for _ in range(100):
+        if version == 4 or client.node.ws.state is ConnectionState.CONNECTED:
+            break
+        await asyncio.sleep(0.05)
+    return client
+
+
+def _give_voice(client: LavalinkClient, guild_id: int):
+    voice = client.get_voice(guild_id)
+    voice.session_id = f"session-{guild_id}"
+    voice.token = f"token-{guild_id}"
+    voice.endpoint = "fake.discord.media"
+
+
+async def bench_play(client: LavalinkClient, plays: int, concurrency: int) -> Dict[str, float]:
+    tracks = await client.search_tracks("benchmark play", use_cache=False)
+    if not tracks:
+        raise RuntimeError("fake node returned no tracks")
+    waiting: Dict[int, asyncio.Future] = {}
+
+    @client.on("track_start")
+    async def _started(event):
+        future = waiting.pop(event.guild_id, None)
+        if future is not None and not future.done():
+            future.set_result(time.perf_counter())
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    loop = asyncio.get_running_loop()
+
+    async def one(i: int):
+        guild_id = 10_000 + i
+        _give_voice(client, guild_id)
+        player = client.get_player(guild_id)
+        async with semaphore:
+            future = waiting[guild_id] = loop.create_future()
+            start = time.perf_counter()
+            await player.play(tracks[i % len(tracks)], replace=True)
+            try:
+                end = await asyncio.wait_for(future, 5.0)
+            except asyncio.TimeoutError:
+                waiting.pop(guild_id, None)
+                return
+            latencies.append((end - start) * 1000)
+
+    await asyncio.gather(*(one(i) for i in range(plays)))
+    client._listeners["track_start"].remove(_started)
+    return {
+        "play_p50_ms": percentile(latencies, 50),
+        "play_p99_ms": percentile(latencies, 99),
+        "play_mean_ms": statistics.fmean(latencies) if latencies else 0.0,
+        "play_timeouts": plays - len(latencies),
+    }
+
+
+async def bench_search(client: LavalinkClient, searches: int, concurrency: int) -> Dict[str, float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    failures = 0
+
+    async def one(i: int):
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            tracks = await client.search_tracks(f"benchmark query {i}", use_cache=False)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if not tracks:
+                failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(searches)))
+    elapsed = time.perf_counter() - start
+    return {
+        "search_per_sec": searches / elapsed if elapsed else 0.0,
+        "search_p50_ms": percentile(latencies, 50),
+        "search_p99_ms": percentile(latencies, 99),
+        "search_empty": failures,
+    }
+
+
+async def bench_events(client: LavalinkClient, fake: FakeLavalink, events: int, guilds: int) -> Dict[str, float]:
+    received = 0
+    done = asyncio.Event()
+
+    @client.on("player_update")
+    async def _updated(event):
+        nonlocal received
+        received += 1
+        if received >= events:
+            done.set()
+
+    dropped_before = client.dispatcher.dropped
+    start = time.perf_counter()
+    # 分批送出，讓假節點的寫入與客戶端的讀取交錯進行
+    for i in range(events):
+        fake.send_player_update(str(20_000 + i % guilds))
+        if i % 500 == 499:
+            await asyncio.sleep(0)
+    try:
+        await asyncio.wait_for(done.wait(), 30.0)
+    except asyncio.TimeoutError:
+        pass
+    elapsed = time.perf_counter() - start
+    client._listeners["player_update"].remove(_updated)
+    return {
+        "events_per_sec": received / elapsed if elapsed else 0.0,
+        "events_received": received,
+        "events_dropped": client.dispatcher.dropped - dropped_before,
+    }
+
+
+async def bench_memory(client: LavalinkClient, players: int, queue_size: int, compact: bool) -> Dict[str, float]:
+    tracks = await client.search_tracks("benchmark memory", use_cache=False)
+    client.compact_queues = compact
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    created = []
+    for i in range(players):
+        guild_id = 30_000 + i
+        _give_voice(client, guild_id)
+        player = client.get_player(guild_id)
+        # 每個 player 各自解碼，避免所有佇列共用同一批 Track 物件而低估用量
+        player.queue.extend(type(t).from_payload(t.encoded) for t in (tracks * (queue_size // len(tracks) + 1))[:queue_size])
+        created.append(player)
+    gc.collect()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    for player in created:
+        client.evict(player.guild_id)
+    return {
+        "memory_per_player_bytes": total / players if players else 0.0,
+        "memory_players": players,
+        "memory_queue_size": queue_size,
+    }
+
+
+async def run(args) -> Dict[str, Any]:
+    config = FakeConfig(
+        version=args.version,
+        latency=args.latency,
+        jitter=args.jitter,
+        failure_rate=args.failure_rate,
+        update_interval=3600,
+        stats_interval=3600,
+    )
+    fake = FakeLavalink(config)
+    await fake.start()
+    client = await _make_client(fake, args.version)
+    results: Dict[str, Any] = {}
+    try:
+        results.update(await bench_play(client, args.plays, args.concurrency))
+        results.update(await bench_search(client, args.searches, args.concurrency))
+        results.update(await bench_events(client, fake, args.events, args.guilds))
+        results.update(await bench_memory(client, args.players, args.queue_size, args.compact))
+    finally:
+        await client.close()
+        await fake.close()
+    return results
+
+
+def _compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> int:
+    regressions = 0
+    print(f"{'metric':<28}{'baseline':>14}{'current':>14}{'change':>10}")
+    for key, value in current.items():
+        old = baseline.get(key)
+        if not isinstance(value, (int, float)) or not isinstance(old, (int, float)):
+            continue
+        change = (value - old) / old if old else 0.0
+        worse = -change if key in HIGHER_IS_BETTER else change
+        flag = ""
+        if worse > threshold and key.endswith(("_ms", "_per_sec", "_bytes")):
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{key:<28}{old:>14.2f}{value:>14.2f}{change:>+9.1%}{flag}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="CatLink benchmark against an in-process fake Lavalink node")
+    parser.add_argument("--version", type=int, choices=(3, 4), default=4)
+    parser.add_argument("--plays", type=int, default=500)
+    parser.add_argument("--searches", type=int, default=2000)
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--guilds", type=int, default=200)
+    parser.add_argument("--players", type=int, default=1000)
+    parser.add_argument("--queue-size", type=int, default=50)
+    parser.add_argument("--compact", action="store_true", help="use compact queues for the memory benchmark")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.0, help="fake REST latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="compare against a previous results JSON file")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change counted as a regression")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    metrics = asyncio.run(run(args))
+    report = {
+        "meta": {
+            "version": args.version,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": int(time.time()),
+            "args": vars(args),
+        },
+        "results": metrics,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        return 1 if _compare(metrics, baseline.get("results", {}), args.threshold) else 0
+    for key, value in metrics.items():
+        print(f"{key:<28}{value:>14.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
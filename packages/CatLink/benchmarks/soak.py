@@ -0,0 +1,356 @@
+"""
+長時間、多 guild 的壓力測試：用假的 Discord gateway 送 VOICE_STATE_UPDATE / VOICE_SERVER_UPDATE，
+模擬使用者在數千個 guild 裡加入語音、播放、跳過、調音量與離開，對本機假節點持續執行。
+
+定期回報事件迴圈延遲、RSS、task 數，以及已不在 client 裡卻仍存活的 Player / VoiceState。
+
+    pip install -e .
+    python benchmarks/soak.py --guilds 5000 --duration 7200 --output soak.json
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import random
+import resource
+import sys
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from CatLink import LavalinkClient
+from CatLink.player import Player
+from CatLink.voice import VoiceState
+
+from fake_lavalink import FakeConfig, FakeLavalink
+from run import StubBot, percentile
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        # 非 Linux 只拿得到峰值
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage if sys.platform == "darwin" else usage * 1024
+
+
+def count_live(*types: type) -> Dict[str, int]:
+    gc.collect()
+    counts = {t.__name__: 0 for t in types}
+    for obj in gc.get_objects():
+        for t in types:
+            if type(obj) is t:
+                counts[t.__name__] += 1
+    return counts
+
+
+class SyntheticGateway:
+    """
+    依 discord.py 的順序餵事件：先是 on_socket_response 的原始 payload，
+    離開語音時再送 on_voice_state_update (member, before, after)。
+    """
+
+    def __init__(self, client: LavalinkClient, user_id: int):
+        self.client = client
+        self.user_id = user_id
+        self.sent = 0
+
+    async def join(self, guild_id: int, channel_id: int):
+        session_id = f"sess-{guild_id}-{random.getrandbits(32):08x}"
+        await self.client._handle_socket_response({
+            "t": "VOICE_STATE_UPDATE",
+            "d": {"guild_id": str(guild_id), "channel_id": str(channel_id), "user_id": str(self.user_id), "session_id": session_id},
+        })
+        await self.client._handle_socket_response({
+            "t": "VOICE_SERVER_UPDATE",
+            "d": {"guild_id": str(guild_id), "token": f"tok-{random.getrandbits(48):012x}", "endpoint": "c-fake01.discord.media:443"},
+        })
+        self.sent += 2
+
+    async def leave(self, guild_id: int, channel_id: int):
+        await self.client._handle_socket_response({
+            "t": "VOICE_STATE_UPDATE",
+            "d": {"guild_id": str(guild_id), "channel_id": None, "user_id": str(self.user_id), "session_id": f"sess-{guild_id}"},
+        })
+        member = SimpleNamespace(id=self.user_id, guild=SimpleNamespace(id=guild_id))
+        before = SimpleNamespace(channel=SimpleNamespace(id=channel_id))
+        after = SimpleNamespace(channel=None)
+        await self.client._on_voice_state_update_event(member, before, after)
+        self.sent += 2
+
+
+class SimulatedGuild:
+    __slots__ = ("guild_id", "channel_id", "in_voice", "busy")
+
+    def __init__(self, guild_id: int):
+        self.guild_id = guild_id
+        self.channel_id = guild_id * 10
+        self.in_voice = False
+        self.busy = False
+
+
+class SoakRunner:
+    def __init__(self, client: LavalinkClient, gateway: SyntheticGateway, guilds: int, tracks: List[Any], leave_chance: float):
+        self.client = client
+        self.gateway = gateway
+        self.guilds = [SimulatedGuild(100_000 + i) for i in range(guilds)]
+        self.tracks = tracks
+        self.leave_chance = leave_chance
+        self.actions: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self._tasks: set = set()
+
+    def spawn(self):
+        guild = random.choice(self.guilds)
+        if guild.busy:
+            return
+        guild.busy = True
+        task = asyncio.ensure_future(self._act(guild))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _act(self, guild: SimulatedGuild):
+        try:
+            action = self._choose(guild)
+            self.actions[action] = self.actions.get(action, 0) + 1
+            await getattr(self, f"_do_{action}")(guild)
+        except Exception as e:
+            name = type(e).__name__
+            self.errors[name] = self.errors.get(name, 0) + 1
+        finally:
+            guild.busy = False
+
+    def _choose(self, guild: SimulatedGuild) -> str:
+        if not guild.in_voice:
+            return "join"
+        roll = random.random()
+        if roll < self.leave_chance:
+            return "leave"
+        return random.choices(("play", "skip", "volume", "pause"), weights=(5, 2, 2, 1))[0]
+
+    async def _do_join(self, guild: SimulatedGuild):
+        await self.gateway.join(guild.guild_id, guild.channel_id)
+        guild.in_voice = True
+        await self._do_play(guild)
+
+    async def _do_play(self, guild: SimulatedGuild):
+        player = self.client.get_player(guild.guild_id)
+        track = random.choice(self.tracks)
+        if player.current is None:
+            await player.play(track)
+        else:
+            player.queue.append(track)
+
+    async def _do_skip(self, guild: SimulatedGuild):
+        player = self.client.peek_player(guild.guild_id)
+        if player is not None:
+            await player.skip()
+
+    async def _do_volume(self, guild: SimulatedGuild):
+        player = self.client.peek_player(guild.guild_id)
+        if player is not None:
+            await player.set_volume(random.randint(10, 150))
+
+    async def _do_pause(self, guild: SimulatedGuild):
+        player = self.client.peek_player(guild.guild_id)
+        if player is not None:
+            await (player.resume() if player.paused else player.pause())
+
+    async def _do_leave(self, guild: SimulatedGuild):
+        player = self.client.peek_player(guild.guild_id)
+        if player is not None:
+            await player.stop()
+        await self.gateway.leave(guild.guild_id, guild.channel_id)
+        guild.in_voice = False
+
+    async def leave_all(self):
+        for guild in self.guilds:
+            if guild.in_voice and not guild.busy:
+                guild.busy = True
+                try:
+                    await self._do_leave(guild)
+                except Exception as e:
+                    name = type(e).__name__
+                    self.errors[name] = self.errors.get(name, 0) + 1
+                finally:
+                    guild.busy = False
+
+    async def wait_idle(self):
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+class LagMonitor:
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.window: List[float] = []
+        self.max_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start - self.interval) * 1000
+            self.window.append(lag)
+            if lag > self.max_lag:
+                self.max_lag = lag
+
+    def drain(self) -> List[float]:
+        window, self.window = self.window, []
+        return window
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+
+def sample(client: LavalinkClient, runner: SoakRunner, lag: LagMonitor, started: float) -> Dict[str, Any]:
+    window = lag.drain()
+    live = count_live(Player, VoiceState)
+    tracked_voice = sum(len(node.voice_states) for node in client.pool.nodes)
+    return {
+        "elapsed_s": round(time.monotonic() - started, 1),
+        "lag_p50_ms": round(percentile(window, 50), 2),
+        "lag_p99_ms": round(percentile(window, 99), 2),
+        "lag_max_ms": round(max(window, default=0.0), 2),
+        "rss_mb": round(rss_bytes() / 2**20, 1),
+        "tasks": len(asyncio.all_tasks()),
+        "players": len(client.players),
+        "voice_states": tracked_voice,
+        "in_voice": sum(1 for g in runner.guilds if g.in_voice),
+        "live_players": live["Player"],
+        "live_voice_states": live["VoiceState"],
+        # 不在 client 管理範圍內卻還活著的物件
+        "leaked_players": live["Player"] - len(client.players),
+        "leaked_voice_states": live["VoiceState"] - tracked_voice,
+        "dispatch_pending": client.dispatcher.pending,
+        "actions": sum(runner.actions.values()),
+        "errors": sum(runner.errors.values()),
+    }
+
+
+def _print(row: Dict[str, Any]):
+    print(
+        f"[{row['elapsed_s']:>8.1f}s] lag p99={row['lag_p99_ms']:.1f}ms max={row['lag_max_ms']:.1f}ms "
+        f"rss={row['rss_mb']}MB tasks={row['tasks']} players={row['players']} voice={row['voice_states']} "
+        f"leaked P/V={row['leaked_players']}/{row['leaked_voice_states']} actions={row['actions']} errors={row['errors']}",
+        flush=True,
+    )
+
+
+async def soak(args) -> Dict[str, Any]:
+    config = FakeConfig(
+        version=args.version,
+        latency=args.latency,
+        jitter=args.jitter,
+        failure_rate=args.failure_rate,
+        track_length=int(args.track_seconds * 1000),
+        track_seconds=args.track_seconds,
+        update_interval=args.update_interval,
+        stats_interval=60.0,
+    )
+    fake = FakeLavalink(config)
+    await fake.start()
+    bot = StubBot()
+    client = LavalinkClient(bot, "127.0.0.1", fake.port, "youshallnotpass", user_id=bot.user.id, version=args.version, idle_timeout=args.idle_timeout)
+    await client.connect()
+    await client.node.wait_ready(timeout=5.0)
+    tracks = await client.search_tracks("soak", limit=50)
+    gateway = SyntheticGateway(client, bot.user.id)
+    runner = SoakRunner(client, gateway, args.guilds, tracks, args.leave_chance)
+    lag = LagMonitor()
+    lag.start()
+
+    started = time.monotonic()
+    samples: List[Dict[str, Any]] = [sample(client, runner, lag, started)]
+    _print(samples[-1])
+    next_report = started + args.report_interval
+    tick = 0.05
+    per_tick = args.rate * tick
+    carry = 0.0
+    try:
+        while time.monotonic() - started < args.duration:
+            carry += per_tick
+            while carry >= 1:
+                runner.spawn()
+                carry -= 1
+            await asyncio.sleep(tick)
+            if time.monotonic() >= next_report:
+                samples.append(sample(client, runner, lag, started))
+                _print(samples[-1])
+                next_report += args.report_interval
+
+        # 全部離開，等回收器清完後再檢查一次，此時 player 與 VoiceState 應該都歸零
+        await runner.wait_idle()
+        await runner.leave_all()
+        await asyncio.sleep((args.idle_timeout or 0) + 2.0)
+        final = sample(client, runner, lag, started)
+        _print(final)
+    finally:
+        lag.stop()
+        await client.close()
+        await fake.close()
+
+    first, last = samples[min(1, len(samples) - 1)], samples[-1]
+    return {
+        "summary": {
+            "guilds": args.guilds,
+            "duration_s": args.duration,
+            "lag_max_ms": round(lag.max_lag, 2),
+            "lag_p99_ms_worst_window": max(s["lag_p99_ms"] for s in samples),
+            "rss_start_mb": first["rss_mb"],
+            "rss_end_mb": last["rss_mb"],
+            "rss_growth_mb": round(last["rss_mb"] - first["rss_mb"], 1),
+            "max_tasks": max(s["tasks"] for s in samples),
+            "players_after_drain": final["players"],
+            "voice_states_after_drain": final["voice_states"],
+            "live_players_after_drain": final["live_players"],
+            "live_voice_states_after_drain": final["live_voice_states"],
+            "leaked_players": final["leaked_players"],
+            "leaked_voice_states": final["leaked_voice_states"],
+            "actions": runner.actions,
+            "errors": runner.errors,
+            "gateway_events": gateway.sent,
+            "node_requests": fake.requests,
+        },
+        "samples": samples + [final],
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Many-guild soak test against an in-process fake Lavalink node")
+    parser.add_argument("--version", type=int, choices=(3, 4), default=4)
+    parser.add_argument("--guilds", type=int, default=2000)
+    parser.add_argument("--duration", type=float, default=600.0, help="seconds to run")
+    parser.add_argument("--rate", type=float, default=200.0, help="simulated user actions per second")
+    parser.add_argument("--leave-chance", type=float, default=0.05)
+    parser.add_argument("--track-seconds", type=float, default=30.0, help="how long fake tracks play before TrackEndEvent")
+    parser.add_argument("--update-interval", type=float, default=5.0, help="playerUpdate interval on the fake node")
+    parser.add_argument("--idle-timeout", type=float, default=30.0)
+    parser.add_argument("--report-interval", type=float, default=30.0)
+    parser.add_argument("--latency", type=float, default=0.002)
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="write samples and summary to this JSON file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.ERROR)
+    report = asyncio.run(soak(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    summary = report["summary"]
+    print(json.dumps(summary, indent=2))
+    return 1 if summary["leaked_players"] or summary["leaked_voice_states"] or summary["players_after_drain"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,29 @@
 from .client import LavalinkClient
 from .voice_client import LavalinkVoiceClient
+from .pool import NodePool
+from .queue import TrackQueue
+from .cache import TrackCache
+from .decoder import decode_track, decode_tracks
+from .session_store import SessionStore, FileSessionStore, SQLiteSessionStore
+from .metrics import Metrics, MetricsRegistry, MetricsServer
+from .tracing import Tracer, LogSink, RingBufferSink, OpenTelemetrySink
 
-__all__ = ["LavalinkClient", "LavalinkVoiceClient"]
\ No newline at end of file
+__all__ = [
+    "LavalinkClient",
+    "LavalinkVoiceClient",
+    "NodePool",
+    "TrackQueue",
+    "TrackCache",
+    "decode_track",
+    "decode_tracks",
+    "SessionStore",
+    "FileSessionStore",
+    "SQLiteSessionStore",
+    "Metrics",
+    "MetricsRegistry",
+    "MetricsServer",
+    "Tracer",
+    "LogSink",
+    "RingBufferSink",
+    "OpenTelemetrySink",
+]
\ No newline at end of file
@@ -0,0 +1,132 @@
+import re
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from .models import Track
+
+_log = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_SEARCH_PREFIX = re.compile(r"^([a-z]+search):", re.IGNORECASE)
+
+# v3 的 loadType 對應到 v4 名稱
+_LOAD_TYPE_ALIASES = {
+    "TRACK_LOADED": "track",
+    "PLAYLIST_LOADED": "playlist",
+    "SEARCH_RESULT": "search",
+    "NO_MATCHES": "empty",
+    "LOAD_FAILED": "error",
+    "short": "track",
+}
+
+DEFAULT_TTLS: Dict[str, float] = {
+    "track": 6 * 3600,
+    "playlist": 3600,
+    "search": 600,
+    "empty": 30,
+    "error": 0,
+}
+
+_ENTRY_OVERHEAD = 64
+_TRACK_OVERHEAD = 120
+
+
+def normalize_identifier(identifier: str) -> str:
+    identifier = identifier.strip()
+    match = _SEARCH_PREFIX.match(identifier)
+    if match:
+        query = _WHITESPACE.sub(" ", identifier[match.end():].strip()).lower()
+        return f"{match.group(1).lower()}:{query}"
+    scheme, sep, rest = identifier.partition("://")
+    if sep:
+        host, slash, path = rest.partition("/")
+        return f"{scheme.lower()}://{host.lower()}{slash}{path}"
+    return identifier
+
+
+def normalize_load_type(load_type: Optional[str]) -> str:
+    if not load_type:
+        return "error"
+    return _LOAD_TYPE_ALIASES.get(load_type, load_type)
+
+
+def _estimate_size(tracks: List[Track]) -> int:
+    size = _ENTRY_OVERHEAD
+    for t in tracks:
+        size += _TRACK_OVERHEAD + len(t.encoded or "") + len(t.title or "") + len(t.author or "") + len(t.uri or "") + len(t.identifier or "")
+    return size
+
+
+class TrackCache:
+    def __init__(self, max_entries: int = 2048, max_bytes: int = 32 * 1024 * 1024, ttls: Optional[Dict[str, float]] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self._entries: "OrderedDict[str, Tuple[float, int, List[Track]]]" = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, identifier: str) -> Optional[List[Track]]:
+        key = normalize_identifier(identifier)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, size, tracks = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.size -= size
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return tracks
+
+    def put(self, identifier: str, load_type: Optional[str], tracks: List[Track]):
+        ttl = self.ttls.get(normalize_load_type(load_type), 0)
+        if ttl <= 0:
+            return
+        size = _estimate_size(tracks)
+        if size > self.max_bytes:
+            return
+        key = normalize_identifier(identifier)
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.size -= old[1]
+        self._entries[key] = (time.monotonic() + ttl, size, list(tracks))
+        self.size += size
+        while self._entries and (len(self._entries) > self.max_entries or self.size > self.max_bytes):
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self.size -= evicted_size
+            self.evictions += 1
+
+    def invalidate(self, identifier: str) -> bool:
+        entry = self._entries.pop(normalize_identifier(identifier), None)
+        if entry is None:
+            return False
+        self.size -= entry[1]
+        return True
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
@@ -1,38 +1,124 @@
 import discord
 import logging
 import asyncio
-from typing import Dict, Optional, List, Callable, Any
-from collections import defaultdict
+from typing import Dict, Optional, List, Callable, Any, Iterable, AsyncIterator, Union
+from collections import defaultdict, deque
 from .rest import RestClient
+from .cache import TrackCache
+from .dispatch import EventDispatcher
+from .codec import JSONCodec, get_codec
 from .node import Node
+from .pool import NodePool
 from .player import Player
+from .voice import VoiceState
+from .models import Track
+from .session_store import SessionStore
+from .timers import TimerWheel
+from .metrics import Metrics, MetricsServer
+from .tracing import Tracer
 
 _log = logging.getLogger(__name__)
 
 class LavalinkClient:
-    def __init__(self, bot: discord.Client, host: str, port: int, password: str, user_id: int, version: int = 4):
+    def __init__(
+        self,
+        bot: discord.Client,
+        host: str,
+        port: int,
+        password: str,
+        user_id: int,
+        version: int = 4,
+        track_cache: Optional[TrackCache] = None,
+        listener_timeout: Optional[float] = 10.0,
+        update_delay: float = 0.0,
+        json_codec: Union[str, JSONCodec, None] = None,
+        session_store: Optional[SessionStore] = None,
+        persist_interval: float = 5.0,
+        failover_delay: Optional[float] = 1.0,
+        overload_penalty: Optional[float] = None,
+        rebalance_batch: int = 5,
+        compact_queues: bool = False,
+        idle_timeout: Optional[float] = 300.0,
+        prefetch_count: int = 3,
+        prefetch_lead: float = 10.0,
+        metrics: Optional[Metrics] = None,
+        tracer: Optional[Tracer] = None,
+        voice_sync_delay: float = 0.25
+    ):
         self.bot = bot
         self._listeners: Dict[str, List[Callable]] = defaultdict(list)
-        self.rest = RestClient(host, port, password, user_id, secure=False, version=version)
-        self.node = Node(self.rest, self._dispatch, host, port, password, user_id, secure=False, version=version)
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.metrics.registry.add_collector(self._collect_metrics)
+        self._metrics_server: Optional[MetricsServer] = None
+        self.tracer = tracer if tracer is not None else Tracer()
+        self.dispatcher = EventDispatcher(self._listeners, timeout=listener_timeout, metrics=self.metrics)
+        self.user_id = user_id
+        self.update_delay = update_delay
+        self.codec = get_codec(json_codec)
+        self.track_cache = track_cache if track_cache is not None else TrackCache()
+        self.pool = NodePool()
+        self.add_node(host, port, password, secure=False, version=version)
         self.players: Dict[int, Player] = {}
+        self.session_store = session_store
+        self.persist_interval = persist_interval
+        self._saved_state: Dict[str, Any] = {}
+        self._persist_task: Optional[asyncio.Task] = None
+        self.failover_delay = failover_delay
+        self.overload_penalty = overload_penalty
+        self.rebalance_batch = rebalance_batch
+        self._failovers: Dict[str, asyncio.Task] = {}
+        self.compact_queues = compact_queues
+        self.idle_timeout = idle_timeout
+        self._reaper = TimerWheel()
+        self._reap_stats: Dict[str, int] = {"checks": 0, "evicted": 0, "kept": 0}
+        self.prefetch_count = prefetch_count
+        self.prefetch_lead = prefetch_lead
+        self._prefetcher = TimerWheel()
+        self.voice_sync_delay = voice_sync_delay
+        self._voice_sync: Dict[int, asyncio.TimerHandle] = {}
         
         self.bot.add_listener(self._handle_socket_response, 'on_socket_response')
         self.bot.add_listener(self._on_voice_state_update_event, 'on_voice_state_update')
         
         _log.info("Lavalink Client Initialized")
-        self.on("track_end")(self._on_track_end)
-        self.on("player_update")(self._on_player_update)
+        self.dispatcher.add_internal("track_start", self._on_track_start)
+        self.dispatcher.add_internal("track_end", self._on_track_end)
+        self.dispatcher.add_internal("player_update", self._on_player_update)
+        self.dispatcher.add_internal("node_ready", self._on_node_ready)
+        self.dispatcher.add_internal("node_state", self._on_node_state)
+        self.dispatcher.add_internal("node_stats", self._on_node_stats)
+
+    @property
+    def node(self) -> Node:
+        return self.pool.primary
+
+    @property
+    def rest(self) -> RestClient:
+        return self.pool.primary.rest
+
+    @property
+    def nodes(self) -> List[Node]:
+        return self.pool.nodes
+
+    def add_node(self, host: str, port: int, password: str, secure: bool = False, version: int = 4, name: Optional[str] = None) -> Node:
+        rest = RestClient(host, port, password, self.user_id, secure=secure, version=version, cache=self.track_cache, codec=self.codec, metrics=self.metrics, tracer=self.tracer)
+        node = Node(rest, self._dispatch, host, port, password, self.user_id, secure=secure, version=version, name=name, update_delay=self.update_delay)
+        return self.pool.add_node(node)
+
+    def get_voice(self, guild_id: int) -> VoiceState:
+        return self.pool.node_for(guild_id).get_voice(guild_id)
 
     async def _on_voice_state_update_event(self, member, before, after):
         if member.id != self.bot.user.id:
             return
         guild_id = member.guild.id
-        if after.channel is not None:
-            self.bot.loop.create_task(self._maybe_push_voice_update(guild_id))
-        else:
-            if guild_id in self.node.voice_states:
-                del self.node.voice_states[guild_id]
+        # 加入時的憑證由 gateway payload / LavalinkVoiceClient 寫入，這裡只處理離開
+        if after.channel is None:
+            self._cancel_voice_sync(guild_id)
+            node = self.pool.get_node(guild_id)
+            if node and guild_id in node.voice_states:
+                del node.voice_states[guild_id]
+            self._touch(guild_id)
 
     async def _handle_socket_response(self, payload: dict):
         if not payload: return
@@ -40,23 +126,40 @@ class LavalinkClient:
         d = payload.get("d")
 
         if t == "VOICE_SERVER_UPDATE":
-            guild_id = int(d["guild_id"])
             endpoint = d["endpoint"]
             if endpoint and ":" in endpoint:
                 endpoint = endpoint.split(":")[0]
+            self.update_voice_credentials(int(d["guild_id"]), token=d["token"], endpoint=endpoint)
             
+        elif t == "VOICE_STATE_UPDATE":
+            if self.bot.user and int(d["user_id"]) == self.bot.user.id and d.get("channel_id") is not None:
+                self.update_voice_credentials(int(d["guild_id"]), session_id=d["session_id"])
 
-            voice = self.node.get_voice(guild_id)
-            voice.token = d["token"]
+    def update_voice_credentials(self, guild_id: int, session_id: Optional[str] = None, token: Optional[str] = None, endpoint: Optional[str] = None):
+        voice = self.get_voice(guild_id)
+        if session_id is not None:
+            voice.session_id = session_id
+        if token is not None:
+            voice.token = token
+        if endpoint is not None:
             voice.endpoint = endpoint
-            self.bot.loop.create_task(self._maybe_push_voice_update(guild_id))
-            
-        elif t == "VOICE_STATE_UPDATE":
-            if self.bot.user and int(d["user_id"]) == self.bot.user.id:
-                guild_id = int(d["guild_id"])
-                voice = self.node.get_voice(guild_id)
-                voice.session_id = d["session_id"]
-                self.bot.loop.create_task(self._maybe_push_voice_update(guild_id))
+        # 同一組憑證重複寫入不會改變版本，也就不會再排一次同步
+        if voice.needs_sync():
+            self._schedule_voice_sync(guild_id)
+
+    def _schedule_voice_sync(self, guild_id: int):
+        # 加入語音時 session_id、token、endpoint 會分好幾個事件到達，等一小段時間再一起處理
+        self._cancel_voice_sync(guild_id)
+        self._voice_sync[guild_id] = self.bot.loop.call_later(self.voice_sync_delay, self._voice_sync_due, guild_id)
+
+    def _cancel_voice_sync(self, guild_id: int):
+        handle = self._voice_sync.pop(guild_id, None)
+        if handle is not None:
+            handle.cancel()
+
+    def _voice_sync_due(self, guild_id: int):
+        self._voice_sync.pop(guild_id, None)
+        self.bot.loop.create_task(self._sync_voice(guild_id))
 
  
     def on(self, event_name: str):
@@ -66,51 +169,353 @@ class LavalinkClient:
         return decorator
 
     async def _dispatch(self, event_name: str, event: Any):
-        for cb in self._listeners[event_name]:
-            try: await cb(event)
-            except: pass
+        self.dispatcher.dispatch(event_name, event)
+
+    async def _on_track_start(self, event):
+        self.tracer.fulfil(event.guild_id, "first_audio")
+        player = self.players.get(event.guild_id)
+        if player is None or self.prefetch_count <= 0:
+            return
+        player.start_prefetch(self.prefetch_count)
+        track = player.current
+        if track is None or track.is_stream or not track.length:
+            return
+        # 快結束前再做一次，期間佇列可能被改過，連線也可能已經閒置
+        remaining = (track.length - player.position) / 1000 / max(player.speed, 0.01)
+        if remaining > self.prefetch_lead:
+            self._prefetcher.schedule(event.guild_id, remaining - self.prefetch_lead, self._prefetch_due)
+
+    def _prefetch_due(self, guild_id: int):
+        player = self.players.get(guild_id)
+        if player is not None and player.current is not None:
+            player.start_prefetch(self.prefetch_count)
 
     async def _on_track_end(self, event):
         if event.guild_id in self.players:
             await self.players[event.guild_id].handle_track_end(event.reason)
+            self._touch(event.guild_id)
 
     async def _on_player_update(self, event):
         gid = int(getattr(event, 'guild_id', 0) or 0)
         if gid in self.players:
-            state = getattr(event, 'state', {}) or {}
-            pos = state.get('position') or state.get('time') or 0
-            try:
-                self.players[gid].position = int(pos)
-            except Exception:
-                self.players[gid].position = 0
+            self.players[gid].update_state(event.state)
 
     def get_player(self, guild_id: int) -> Player:
-        if guild_id not in self.players:
-            self.players[guild_id] = Player(guild_id, self.node)
-        return self.players[guild_id]
+        player = self.players.get(guild_id)
+        if player is None:
+            player = self.players[guild_id] = Player(guild_id, self.pool.node_for(guild_id), compact_queue=self.compact_queues)
+        elif player.current is None:
+            # 沒有節點可用時建立的 player，節點恢復後跟著 pool 改到新選的節點
+            player.rebind(self.pool.node_for(guild_id))
+        self._touch(guild_id)
+        return player
+
+    def peek_player(self, guild_id: int) -> Optional[Player]:
+        # 只查詢，不會建立 player
+        return self.players.get(guild_id)
+
+    def _touch(self, guild_id: int):
+        if self.idle_timeout is not None:
+            self._reaper.schedule(guild_id, self.idle_timeout, self._check_idle)
+
+    def _is_idle(self, guild_id: int) -> bool:
+        player = self.players.get(guild_id)
+        if player is not None and (player.current is not None or player.queue):
+            return False
+        node = self.pool.get_node(guild_id)
+        voice = node.voice_states.get(guild_id) if node else None
+        return voice is None or voice.session_id is None
 
-    async def _maybe_push_voice_update(self, guild_id: int):
-        voice = self.node.get_voice(guild_id)
-        if not voice.ready():
+    def _check_idle(self, guild_id: int):
+        self._reap_stats["checks"] += 1
+        if not self._is_idle(guild_id):
+            # 還在使用中，重新計時；之後沒有任何事件也會再檢查一次
+            self._reap_stats["kept"] += 1
+            self._touch(guild_id)
             return
-        ready = await self.node.wait_ready(timeout=8.0)
+        self.evict(guild_id)
+
+    def evict(self, guild_id: int):
+        self._reaper.cancel(guild_id)
+        self._cancel_voice_sync(guild_id)
+        self.tracer.discard(guild_id)
+        self._prefetcher.cancel(guild_id)
+        player = self.players.pop(guild_id, None)
+        if player is not None:
+            player.cancel_prefetch()
+        node = self.pool.get_node(guild_id)
+        if node is not None:
+            node.voice_states.pop(guild_id, None)
+        self.pool.release(guild_id)
+        if player is not None:
+            self._reap_stats["evicted"] += 1
+            _log.debug(f"[Reaper] Evicted idle player (guild={guild_id})")
+
+    def reaper_stats(self) -> Dict[str, int]:
+        return {
+            "players": len(self.players),
+            "voice_states": sum(len(node.voice_states) for node in self.pool.nodes),
+            "pending": len(self._reaper),
+            **self._reap_stats,
+        }
+
+    async def _sync_voice(self, guild_id: int):
+        player = self.players.get(guild_id)
+        if player is None or player.current is None:
+            # 還沒開始播放，憑證留給下一個播放請求一起送
+            return
+        node = self.pool.node_for(guild_id)
+        if not node.get_voice(guild_id).needs_sync():
+            return
+        ready = await node.wait_ready(timeout=8.0)
         if not ready:
             _log.warning(f"[Voice] session_id not ready, skipping sync (guild={guild_id})")
             return
-        status = await self.node.update_voice(guild_id)
+        status = await node.update_voice(guild_id)
         if status not in (None, True, 200, 204):
             _log.warning(f"[Voice] update_voice returned {status} (guild={guild_id})")
+
     async def connect(self):
-        await self.node.connect()
+        if self.session_store is not None:
+            self._saved_state = await self.session_store.load() or {}
+        sessions = self._saved_state.get("sessions") or {}
+        for node in self.pool.nodes:
+            await node.connect(session_id=sessions.get(node.name))
+        if self.session_store is not None and self._persist_task is None:
+            self._persist_task = asyncio.create_task(self._persist_loop())
+
+    async def close(self):
+        if self._persist_task is not None:
+            self._persist_task.cancel()
+            self._persist_task = None
+        if self.session_store is not None:
+            await self.save_state()
+        self._reaper.close()
+        self._prefetcher.close()
+        failovers = list(self._failovers.values())
+        for task in failovers:
+            task.cancel()
+        if failovers:
+            await asyncio.gather(*failovers, return_exceptions=True)
+        for handle in self._voice_sync.values():
+            handle.cancel()
+        self._voice_sync.clear()
+        if self._metrics_server is not None:
+            await self._metrics_server.close()
+            self._metrics_server = None
+        for node in self.pool.nodes:
+            await node.close()
+        await self.dispatcher.close()
+
+    async def start_metrics_server(self, host: str = "127.0.0.1", port: int = 9108) -> MetricsServer:
+        if self._metrics_server is None:
+            self._metrics_server = MetricsServer(self.metrics.registry, host, port)
+            await self._metrics_server.start()
+        return self._metrics_server
+
+    def _collect_metrics(self):
+        m = self.metrics
+        counts = {node.name: 0 for node in self.pool.nodes}
+        for player in self.players.values():
+            counts[player.node.name] = counts.get(player.node.name, 0) + 1
+        for name, count in counts.items():
+            m.players.labels(name).set(count)
+        for node in self.pool.nodes:
+            stats = node.stats
+            if stats is None:
+                continue
+            for field in stats.__slots__:
+                value = getattr(stats, field)
+                if isinstance(value, (int, float)):
+                    m.node_stats.labels(node.name, field).set(value)
+        m.dispatch_dropped.set(self.dispatcher.dropped)
+        for key, value in self.track_cache.stats().items():
+            m.cache.labels(key).set(value)
 
-    async def load_track(self, query: str, source: str = "spsearch"):
+    def _find_node(self, name: str) -> Optional[Node]:
+        for node in self.pool.nodes:
+            if node.name == name:
+                return node
+        return None
+
+    async def _on_node_ready(self, event):
+        node = self._find_node(event.node)
+        if node is None:
+            return
+        if not event.resumed:
+            # 新的 session 沒有任何 player，之前送過的憑證都要重送
+            for voice in node.voice_states.values():
+                voice.invalidate()
+            # 節點重啟後換了新的 session，記憶體裡還在播放的 player 要重新送出
+            for player in self.players_on(node):
+                if player.current is not None:
+                    asyncio.create_task(player.resync())
+        if node.orphaned:
+            # 故障期間已搬走的 player，節點接回 session 後要把舊的那份清掉
+            orphaned, node.orphaned = node.orphaned, set()
+            if event.resumed:
+                for guild_id in orphaned:
+                    if self.pool.get_node(guild_id) is not node:
+                        await node.destroy(guild_id)
+        saved = self._saved_state.get("players") or {}
+        if not saved:
+            return
+        restored = 0
+        for key, data in list(saved.items()):
+            if data.get("node") != node.name:
+                continue
+            del saved[key]
+            guild_id = int(key)
+            player = self.players.get(guild_id)
+            if player is None:
+                self.pool.assign(guild_id, node)
+                player = self.players[guild_id] = Player(guild_id, node, compact_queue=self.compact_queues)
+                player.restore(data)
+            else:
+                # 節點 ready 前就被建立的 player，把保存的狀態併進去而不是丟掉
+                if player.current is None:
+                    self.pool.assign(guild_id, node)
+                    player.rebind(node)
+                player.restore(data, merge=True)
+            self._touch(guild_id)
+            restored += 1
+            if not event.resumed and player.current is not None:
+                # session 沒有被接回，用保存的憑證與位置重新送出播放
+                asyncio.create_task(player.resync())
+        _log.info(f"[Store] Restored {restored} players on node {node.name} (resumed={event.resumed})")
+        if self.session_store is not None:
+            await self.save_state()
+
+    def players_on(self, node: Node) -> List[Player]:
+        return [p for p in self.players.values() if p.node is node]
+
+    async def migrate(self, guild_id: int, node: Optional[Node] = None) -> bool:
+        player = self.players.get(guild_id)
+        if player is None:
+            return False
+        if node is None and not self._has_other_node(player.node):
+            return False
+        target = node or self.pool.best_node(exclude=player.node)
+        if target is player.node or not target.available:
+            _log.warning(f"[Pool] No healthy node to move guild {guild_id} to")
+            return False
+        self.pool.assign(guild_id, target)
+        try:
+            await player.move_to(target)
+        except Exception as e:
+            _log.error(f"[Pool] Failed to move guild {guild_id} to {target.name}: {e}")
+            return False
+        return True
+
+    def _has_other_node(self, node: Node) -> bool:
+        return any(n is not node for n in self.pool.nodes)
+
+    async def drain_node(self, node: Node, limit: Optional[int] = None) -> int:
+        if not self._has_other_node(node):
+            # 只有一個節點時沒有地方可搬，等它重連後由 _on_node_ready 重新送出
+            _log.warning(f"[Pool] No other node to move players off {node.name}")
+            return 0
+        players = self.players_on(node)
+        if limit is not None:
+            players = players[:limit]
+        if not players:
+            return 0
+        results = await asyncio.gather(*(self.migrate(p.guild_id) for p in players))
+        moved = sum(1 for r in results if r)
+        _log.info(f"[Pool] Moved {moved}/{len(players)} players off {node.name}")
+        return moved
+
+    async def _on_node_state(self, event):
+        if event.state != "disconnected" or self.failover_delay is None:
+            return
+        node = self._find_node(event.node)
+        if node is None or event.node in self._failovers:
+            return
+        self._failovers[event.node] = asyncio.create_task(self._failover(node))
+
+    async def _failover(self, node: Node):
+        try:
+            # 先給節點一點時間重連，短暫斷線接回 session 就不需要搬移
+            await asyncio.sleep(self.failover_delay)
+            if not node.available:
+                await self.drain_node(node)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            _log.error(f"[Pool] Failover for node {node.name} failed: {e}")
+        finally:
+            self._failovers.pop(node.name, None)
+
+    async def _on_node_stats(self, event):
+        if self.overload_penalty is None or len(self.pool.nodes) < 2:
+            return
+        node = self._find_node(event.node)
+        if node is None:
+            return
+        penalty = self.pool.penalty(node)
+        if penalty < self.overload_penalty:
+            return
+        target = self.pool.best_node(exclude=node)
+        if not target.available or self.pool.penalty(target) * 2 > penalty:
+            return
+        _log.info(f"[Pool] Node {node.name} overloaded (penalty={penalty:.1f}), moving up to {self.rebalance_batch} players")
+        await self.drain_node(node, limit=self.rebalance_batch)
+
+    def _build_state(self) -> Dict[str, Any]:
+        players = dict(self._saved_state.get("players") or {})
+        for guild_id, player in self.players.items():
+            if player.current is not None or player.queue:
+                players[str(guild_id)] = player.snapshot()
+        return {
+            "sessions": {node.name: node.session_id for node in self.pool.nodes if node.session_id},
+            "players": players,
+        }
+
+    async def save_state(self):
+        try:
+            await self.session_store.save(self._build_state())
+        except Exception as e:
+            _log.error(f"[Store] Failed to save session state: {e}")
+
+    async def _persist_loop(self):
+        while True:
+            await asyncio.sleep(self.persist_interval)
+            await self.save_state()
+
+    @staticmethod
+    def _build_identifier(query: str, source: str) -> str:
         if not query.startswith(("http", "https")):
             query = f"{source}:{query}"
-        tracks = await self.rest.load_tracks(query)
+        return query
+
+    async def load_track(self, query: str, source: str = "spsearch", use_cache: bool = True):
+        tracks = await self.pool.best_node().rest.load_tracks(self._build_identifier(query, source), use_cache=use_cache)
         return tracks[0] if tracks else None
 
-    async def search_tracks(self, query: str, source: str = "ytsearch", limit: int = 10):
-        if not query.startswith(("http", "https")):
-            query = f"{source}:{query}"
-        tracks = await self.rest.load_tracks(query)
+    async def search_tracks(self, query: str, source: str = "ytsearch", limit: int = 10, use_cache: bool = True):
+        tracks = await self.pool.best_node().rest.load_tracks(self._build_identifier(query, source), use_cache=use_cache)
         return tracks[:limit] if tracks else []
+
+    async def load_tracks_many(self, queries: Iterable[str], source: str = "spsearch", concurrency: int = 8, use_cache: bool = True) -> AsyncIterator[Optional[Track]]:
+        concurrency = max(1, concurrency)
+        semaphore = asyncio.Semaphore(concurrency)
+        rest = self.pool.best_node().rest
+
+        async def resolve(query: str) -> Optional[Track]:
+            async with semaphore:
+                tracks = await rest.load_tracks(self._build_identifier(query, source), use_cache=use_cache)
+            return tracks[0] if tracks else None
+
+        # 只預先排程有限數量的查詢，依輸入順序逐一回傳，前面的結果不必等整批完成
+        pending: deque = deque()
+        window = concurrency * 2
+        try:
+            for query in queries:
+                pending.append(asyncio.ensure_future(resolve(query)))
+                if len(pending) >= window:
+                    yield await pending.popleft()
+            while pending:
+                yield await pending.popleft()
+        finally:
+            for task in pending:
+                task.cancel()
@@ -0,0 +1,100 @@
+import base64
+import binascii
+import sys
+from typing import Any, Iterable, Optional, Set, Union
+from .models import Track
+
+_SEEKABLE = 1
+_STREAM = 2
+
+
+class PackedTrack:
+    __slots__ = ("raw", "title", "author", "length", "uri_prefix", "uri_rest", "identifier", "flags", "source_name", "artwork_url", "isrc")
+
+    def __init__(self, raw, title, author, length, uri_prefix, uri_rest, identifier, flags, source_name, artwork_url, isrc):
+        self.raw = raw
+        self.title = title
+        self.author = author
+        self.length = length
+        self.uri_prefix = uri_prefix
+        self.uri_rest = uri_rest
+        self.identifier = identifier
+        self.flags = flags
+        self.source_name = source_name
+        self.artwork_url = artwork_url
+        self.isrc = isrc
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if value else value
+
+
+def pack(track: Track) -> Union[PackedTrack, Track]:
+    raw = None
+    if track.encoded:
+        try:
+            raw = base64.b64decode(track.encoded, validate=True)
+        except (binascii.Error, ValueError):
+            raw = None
+        if raw is None or base64.b64encode(raw).decode("ascii") != track.encoded:
+            # 不是標準的 base64，轉回來會跟原本不同，直接保存原本的 Track
+            return track
+    uri = track.uri or ""
+    split = max(uri.rfind("/"), uri.rfind("=")) + 1
+    prefix = _intern(uri[:split])
+    rest = uri[split:]
+    if rest == track.identifier:
+        # 大部分來源的 uri 結尾就是 identifier，不必再存一份
+        rest = None
+    flags = (_SEEKABLE if track.is_seekable else 0) | (_STREAM if track.is_stream else 0)
+    return PackedTrack(
+        raw,
+        track.title,
+        _intern(track.author),
+        track.length,
+        prefix,
+        rest,
+        track.identifier,
+        flags,
+        _intern(track.source_name),
+        track.artwork_url,
+        track.isrc,
+    )
+
+
+def unpack(packed: PackedTrack) -> Track:
+    rest = packed.identifier if packed.uri_rest is None else packed.uri_rest
+    return Track(
+        base64.b64encode(packed.raw).decode("ascii") if packed.raw is not None else None,
+        packed.title,
+        packed.author,
+        packed.length,
+        packed.uri_prefix + rest,
+        packed.identifier,
+        bool(packed.flags & _SEEKABLE),
+        bool(packed.flags & _STREAM),
+        packed.source_name,
+        packed.artwork_url,
+        packed.isrc,
+    )
+
+
+def _sizeof(obj: Any, seen: Set[int]) -> int:
+    if obj is None or id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    return sys.getsizeof(obj)
+
+
+def estimate_size(entries: Iterable[Any]) -> int:
+    # 同一個字串物件只算一次，所以共用 (intern) 的作者、uri 前綴會反映在結果裡
+    seen: Set[int] = set()
+    total = 0
+    for entry in entries:
+        total += _sizeof(entry, seen)
+        slots = getattr(type(entry), "__slots__", ())
+        for name in slots:
+            value = getattr(entry, name, None)
+            if isinstance(value, (str, bytes)):
+                total += _sizeof(value, seen)
+    return total
@@ -0,0 +1,104 @@
+import base64
+import binascii
+import struct
+from typing import Iterable, List, Optional, Tuple
+from .errors import TrackDecodeError
+from .models import Track
+
+_INT = struct.Struct(">i")
+_LONG = struct.Struct(">q")
+_USHORT = struct.Struct(">H")
+
+_TRACK_INFO_VERSIONED = 1
+
+
+def _read_utf(buf: memoryview, offset: int) -> Tuple[str, int]:
+    (size,) = _USHORT.unpack_from(buf, offset)
+    offset += 2
+    end = offset + size
+    if end > len(buf):
+        raise TrackDecodeError("String runs past end of track data")
+    try:
+        return str(buf[offset:end], "utf-8"), end
+    except UnicodeDecodeError:
+        return _decode_modified_utf8(bytes(buf[offset:end])), end
+
+
+def _decode_modified_utf8(raw: bytes) -> str:
+    # Java 的 modified UTF-8：NUL 編成 C0 80，補充平面字元編成兩個 surrogate
+    text = raw.replace(b"\xc0\x80", b"\x00").decode("utf-8", "surrogatepass")
+    return text.encode("utf-16", "surrogatepass").decode("utf-16")
+
+
+def _read_nullable_utf(buf: memoryview, offset: int) -> Tuple[Optional[str], int]:
+    present = buf[offset]
+    offset += 1
+    if not present:
+        return None, offset
+    return _read_utf(buf, offset)
+
+
+def decode_track(encoded: str) -> Track:
+    try:
+        raw = base64.b64decode(encoded)
+    except (binascii.Error, ValueError, TypeError) as e:
+        raise TrackDecodeError(f"Invalid base64 track data: {e}") from None
+
+    buf = memoryview(raw)
+    try:
+        (header,) = _INT.unpack_from(buf, 0)
+        flags = (header & 0xC0000000) >> 30
+        offset = 4
+        if flags & _TRACK_INFO_VERSIONED:
+            version = buf[offset]
+            offset += 1
+        else:
+            version = 1
+        if version not in (1, 2, 3):
+            raise TrackDecodeError(f"Unsupported track message version {version}")
+
+        title, offset = _read_utf(buf, offset)
+        author, offset = _read_utf(buf, offset)
+        (length,) = _LONG.unpack_from(buf, offset)
+        offset += 8
+        identifier, offset = _read_utf(buf, offset)
+        is_stream = bool(buf[offset])
+        offset += 1
+
+        uri = None
+        artwork_url = None
+        isrc = None
+        if version >= 2:
+            uri, offset = _read_nullable_utf(buf, offset)
+        if version >= 3:
+            artwork_url, offset = _read_nullable_utf(buf, offset)
+            isrc, offset = _read_nullable_utf(buf, offset)
+        source_name, offset = _read_utf(buf, offset)
+        # 之後是各來源自訂的欄位與 position，目前用不到，不需要解析
+    except (struct.error, IndexError):
+        raise TrackDecodeError("Track data is truncated") from None
+
+    return Track(
+        encoded=encoded,
+        title=title,
+        author=author,
+        length=length,
+        uri=uri or "",
+        identifier=identifier,
+        is_seekable=not is_stream,
+        is_stream=is_stream,
+        source_name=source_name,
+        artwork_url=artwork_url,
+        isrc=isrc,
+    )
+
+
+def decode_tracks(encoded_tracks: Iterable[str], skip_invalid: bool = False) -> List[Track]:
+    tracks = []
+    for encoded in encoded_tracks:
+        try:
+            tracks.append(decode_track(encoded))
+        except TrackDecodeError:
+            if not skip_invalid:
+                raise
+    return tracks
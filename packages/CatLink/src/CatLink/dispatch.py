@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+from .metrics import Metrics
+
+_log = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class ListenerStats:
+    calls: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+    failures: int = 0
+    timeouts: int = 0
+
+    @property
+    def avg_time(self) -> float:
+        return self.total_time / self.calls if self.calls else 0.0
+
+
+def _listener_name(cb: Callable) -> str:
+    return getattr(cb, "__qualname__", None) or repr(cb)
+
+
+class EventDispatcher:
+    def __init__(self, listeners: Dict[str, List[Callable]], timeout: Optional[float] = 10.0, max_lane_size: int = 1000, metrics: Optional[Metrics] = None):
+        self._listeners = listeners
+        self._internal: Dict[str, List[Callable]] = defaultdict(list)
+        self.timeout = timeout
+        self.max_lane_size = max_lane_size
+        self._lanes: Dict[Any, Deque[Tuple[str, Any]]] = {}
+        self._workers: Dict[Any, asyncio.Task] = {}
+        self.stats: Dict[Tuple[str, str], ListenerStats] = {}
+        self.dropped = 0
+        self.metrics = metrics if metrics is not None else Metrics()
+
+    def add_internal(self, event_name: str, cb: Callable):
+        self._internal[event_name].append(cb)
+
+    def dispatch(self, event_name: str, event: Any):
+        # 同一個 guild 的事件依序處理，不同 guild 之間互不阻塞；呼叫端 (WS 讀取迴圈) 不會等待 listener
+        key = getattr(event, "guild_id", None)
+        lane = self._lanes.get(key)
+        if lane is None:
+            lane = self._lanes[key] = deque()
+        elif len(lane) >= self.max_lane_size and event_name == "player_update":
+            self.dropped += 1
+            return
+        lane.append((event_name, event))
+        if key not in self._workers:
+            self._workers[key] = asyncio.create_task(self._drain(key, lane))
+
+    async def _drain(self, key: Any, lane: Deque[Tuple[str, Any]]):
+        try:
+            while lane:
+                event_name, event = lane.popleft()
+                for cb in tuple(self._internal.get(event_name, ())):
+                    await self._invoke(event_name, cb, event, None)
+                for cb in tuple(self._listeners.get(event_name, ())):
+                    await self._invoke(event_name, cb, event, self.timeout)
+        finally:
+            self._workers.pop(key, None)
+            self._lanes.pop(key, None)
+
+    async def _invoke(self, event_name: str, cb: Callable, event: Any, timeout: Optional[float]):
+        name = _listener_name(cb)
+        stats = self.stats.get((event_name, name))
+        if stats is None:
+            stats = self.stats[(event_name, name)] = ListenerStats()
+        start = time.perf_counter()
+        try:
+            if timeout is None:
+                await cb(event)
+            else:
+                await asyncio.wait_for(cb(event), timeout)
+        except asyncio.TimeoutError:
+            stats.timeouts += 1
+            self.metrics.dispatch_timeouts.labels(event_name, name).inc()
+            _log.warning(f"[Dispatch] Listener {name} for {event_name} timed out after {timeout}s")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            stats.failures += 1
+            self.metrics.dispatch_failures.labels(event_name, name).inc()
+            _log.exception(f"[Dispatch] Listener {name} for {event_name} raised")
+        finally:
+            elapsed = time.perf_counter() - start
+            self.metrics.dispatch_latency.labels(event_name, name).observe(elapsed)
+            stats.calls += 1
+            stats.total_time += elapsed
+            if elapsed > stats.max_time:
+                stats.max_time = elapsed
+
+    @property
+    def pending(self) -> int:
+        return sum(len(lane) for lane in self._lanes.values())
+
+    async def close(self):
+        workers = list(self._workers.values())
+        for task in workers:
+            task.cancel()
+        if workers:
+            await asyncio.gather(*workers, return_exceptions=True)
@@ -3,4 +3,7 @@ class LavalinkError(Exception):
 
 
 class LavalinkConnectionError(LavalinkError):
-    pass
\ No newline at end of file
+    pass
+
+class TrackDecodeError(LavalinkError):
+    pass
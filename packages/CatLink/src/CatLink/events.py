@@ -1,28 +1,28 @@
 from dataclasses import dataclass
 from typing import Dict, Any, Optional
-from .models import Track
+from .models import Track, PlayerState, NodeStats
 
 @dataclass(slots=True)
 class TrackStartEvent:
     guild_id: int
-    track: Dict[str, Any]
+    track: Track
 
 @dataclass(slots=True)
 class TrackEndEvent:
     guild_id: int
     reason: str
-    track: Dict[str, Any]
+    track: Track
 
 @dataclass(slots=True)
 class TrackExceptionEvent:
     guild_id: int
-    track: Dict[str, Any]
+    track: Track
     exception: Dict[str, Any]
 
 @dataclass(slots=True)
 class TrackStuckEvent:
     guild_id: int
-    track: Dict[str, Any]
+    track: Track
     threshold_ms: int
 
 @dataclass(slots=True)
@@ -35,4 +35,21 @@ class WebSocketClosedEvent:
 @dataclass(slots=True)
 class PlayerUpdateEvent:
     guild_id: int
-    state: Dict[str, Any]
+    state: PlayerState
+
+@dataclass(slots=True)
+class NodeReadyEvent:
+    node: str
+    session_id: Optional[str]
+    resumed: bool
+
+@dataclass(slots=True)
+class NodeStateEvent:
+    node: str
+    state: str
+    previous: str
+
+@dataclass(slots=True)
+class NodeStatsEvent:
+    node: str
+    stats: NodeStats
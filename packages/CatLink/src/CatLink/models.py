@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Optional
+from typing import Any, Dict, Optional, Union
 
 @dataclass(slots=True)
 class Track:
@@ -11,3 +11,108 @@ class Track:
     identifier: str
     is_seekable: bool = True
     is_stream: bool = False
+    source_name: str = ""
+    artwork_url: Optional[str] = None
+    isrc: Optional[str] = None
+
+    @classmethod
+    def from_payload(cls, data: Union[Dict[str, Any], str]) -> "Track":
+        if isinstance(data, str):
+            # v3 的事件只帶 encoded 字串
+            from .decoder import decode_track
+            return decode_track(data)
+        info = data.get("info", data)
+        get = info.get
+        return cls(
+            data.get("encoded") or data.get("track"),
+            get("title", "Unknown"),
+            get("author", "Unknown"),
+            get("length", 0),
+            get("uri") or "",
+            get("identifier", ""),
+            get("isSeekable", True),
+            get("isStream", False),
+            get("sourceName", ""),
+            get("artworkUrl"),
+            get("isrc"),
+        )
+
+@dataclass(slots=True)
+class LazyTrack:
+    # 尚未解析的佇列項目，只帶顯示用的資訊，接近佇列前端時才向節點查詢
+    query: str
+    title: str = ""
+    author: str = ""
+    length: int = 0
+    uri: str = ""
+    source: str = "ytsearch"
+    is_stream: bool = False
+
+    def __post_init__(self):
+        if not self.title:
+            self.title = self.query
+
+    @property
+    def load_identifier(self) -> str:
+        if self.query.startswith(("http://", "https://")):
+            return self.query
+        return f"{self.source}:{self.query}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "query": self.query,
+            "title": self.title,
+            "author": self.author,
+            "length": self.length,
+            "uri": self.uri,
+            "source": self.source,
+        }
+
+@dataclass(slots=True)
+class PlayerState:
+    time: int = 0
+    position: int = 0
+    connected: bool = False
+    ping: int = -1
+
+    @classmethod
+    def from_payload(cls, data: Dict[str, Any]) -> "PlayerState":
+        get = data.get
+        return cls(get("time", 0), get("position", 0), get("connected", False), get("ping", -1))
+
+@dataclass(slots=True)
+class NodeStats:
+    players: int = 0
+    playing_players: int = 0
+    uptime: int = 0
+    memory_used: int = 0
+    memory_free: int = 0
+    memory_allocated: int = 0
+    memory_reservable: int = 0
+    cpu_cores: int = 0
+    system_load: float = 0.0
+    lavalink_load: float = 0.0
+    frames_sent: int = 0
+    frames_nulled: int = 0
+    frames_deficit: int = 0
+
+    @classmethod
+    def from_payload(cls, data: Dict[str, Any]) -> "NodeStats":
+        memory = data.get("memory") or {}
+        cpu = data.get("cpu") or {}
+        frames = data.get("frameStats") or {}
+        return cls(
+            data.get("players", 0),
+            data.get("playingPlayers", 0),
+            data.get("uptime", 0),
+            memory.get("used", 0),
+            memory.get("free", 0),
+            memory.get("allocated", 0),
+            memory.get("reservable", 0),
+            cpu.get("cores", 0),
+            cpu.get("systemLoad", 0.0),
+            cpu.get("lavalinkLoad", 0.0),
+            frames.get("sent", 0),
+            frames.get("nulled", 0),
+            frames.get("deficit", 0),
+        )
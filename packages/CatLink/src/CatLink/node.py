@@ -1,13 +1,18 @@
 import asyncio
 import logging
-from typing import Optional, Callable, Dict, Any, Union
+from typing import Optional, Callable, Dict, Any, Union, Set
 from .voice import VoiceState
-from .websocket import LavalinkWebSocket
+from .websocket import LavalinkWebSocket, ConnectionState
 from .events import *
-from .models import Track
+from .models import Track, PlayerState, NodeStats
+from .writer import PlayerUpdateWriter
+from .errors import TrackDecodeError
 
 _log = logging.getLogger(__name__)
 
+# 斷線時請求最多等新的 session 這麼久
+SESSION_TIMEOUT = 8.0
+
 class Node:
     def __init__(
         self, 
@@ -18,7 +23,9 @@ class Node:
         password: str, 
         user_id: int, 
         secure: bool = False,
-        version: int = 4
+        version: int = 4,
+        name: Optional[str] = None,
+        update_delay: float = 0.0
     ):
         self.rest = rest
         self.dispatch = dispatch
@@ -28,20 +35,42 @@ class Node:
         self.user_id = user_id
         self.secure = secure
         self.version = version
+        self.name = name or f"{host}:{port}"
 
         self.voice_states: Dict[int, VoiceState] = {}
         self.ws: Optional[LavalinkWebSocket] = None
-        self.stats: Dict[str, Any] = {}
+        self.stats: Optional[NodeStats] = None
+        self._session_ready = asyncio.Event()
+        self._closed = False
+        # 等 session 中的 guild；player 搬走時用來放行
+        self._held: Dict[int, asyncio.Event] = {}
+        self.writer = PlayerUpdateWriter(rest, delay=update_delay, gate=self._wait_session)
+        self.resumed = False
+        self._had_session = False
+        self.orphaned: Set[int] = set()
+        self._frame_counters: Dict[Any, Any] = {}
 
     @property
     def base_uri(self) -> str:
         protocol = "https" if self.secure else "http"
         return f"{protocol}://{self.host}:{self.port}"
 
+    @property
+    def session_id(self) -> Optional[str]:
+        if self.ws is not None and self.ws.session_id:
+            return self.ws.session_id
+        return self.rest.session_id
+
+    @property
+    def available(self) -> bool:
+        if self.ws is None or self.ws.ws is None or self.ws.ws.closed:
+            return False
+        return self.version != 4 or self._session_ready.is_set()
+
     def get_voice(self, guild_id: int) -> VoiceState:
         return self.voice_states.setdefault(guild_id, VoiceState())
 
-    async def connect(self):
+    async def connect(self, session_id: Optional[str] = None):
         _log.info(f"Connecting to Node {self.host}:{self.port} (Version: {self.version})...")
         await self.rest.start()
         self.ws = LavalinkWebSocket(
@@ -49,158 +78,283 @@ class Node:
             self.port,
             self.password,
             self.user_id,
-            None, 
+            session_id,
             self._handle_payload,
             self.secure,
-            self.version
+            self.version,
+            self.rest.codec,
+            on_state_change=self._on_ws_state
         )
         asyncio.create_task(self.ws.connect())
 
+    async def _on_ws_state(self, state: ConnectionState, previous: ConnectionState):
+        if state in (ConnectionState.DISCONNECTED, ConnectionState.CLOSED) and not self._closed:
+            # session_id 保留給重連時接回 session；REST 請求先等新的 ready 再送出
+            self._session_ready.clear()
+        if state is ConnectionState.RECONNECTING:
+            self.rest.metrics.ws_reconnects.labels(self.name).inc()
+        await self.dispatch("node_state", NodeStateEvent(self.name, state.value, previous.value))
+
+    async def close(self):
+        # 放行還在等 session 的請求，讓它們以失敗結束而不是永遠掛著
+        self._closed = True
+        self._session_ready.set()
+        if self.ws:
+            self.ws.close()
+            if self.ws.ws and not self.ws.ws.closed:
+                await self.ws.ws.close()
+        await self.rest.close()
+
     async def wait_ready(self, timeout: float = 10.0) -> bool:
-        if self.version != 4:
+        if self.version != 4 or self._session_ready.is_set():
             return True
-        waited = 0.0
-        while self.rest.session_id is None and waited < timeout:
-            await asyncio.sleep(0.1)
-            waited += 0.1
-        return self.rest.session_id is not None
+        with self.rest.tracer.span("node.wait_ready", node=self.name) as span:
+            try:
+                await asyncio.wait_for(self._session_ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                span.set("timed_out", True)
+        return self._session_ready.is_set()
+
+    async def _wait_session(self, guild_id: int) -> bool:
+        # 斷線期間先不丟掉請求，等 session 回來再送；逾時、節點關閉或 player 已搬走時回傳 False
+        if self.version != 4 or self._session_ready.is_set():
+            return not self._closed
+        _log.info(f"[Node] {self.name} session not ready, holding request (guild={guild_id})")
+        released = self._held.setdefault(guild_id, asyncio.Event())
+        waiters = [asyncio.ensure_future(self._session_ready.wait()), asyncio.ensure_future(released.wait())]
+        try:
+            await asyncio.wait(waiters, timeout=SESSION_TIMEOUT, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+        if released.is_set() or not self._session_ready.is_set():
+            return False
+        return not self._closed
 
-    async def update_voice(self, guild_id: int, session_id: str = None, token: str = None, endpoint: str = None):
+    def release(self, guild_id: int):
+        # player 換到其他節點，還在等這個節點 session 的請求直接結束
+        released = self._held.pop(guild_id, None)
+        if released is not None:
+            released.set()
+
+    async def update_voice(self, guild_id: int, session_id: str = None, token: str = None, endpoint: str = None, force: bool = False):
         voice = self.get_voice(guild_id)
  
         if session_id: voice.session_id = session_id
         if token: voice.token = token
         if endpoint: voice.endpoint = endpoint
-        if not voice.ready():
+        if force:
+            voice.invalidate()
+        # 同一組憑證只送一次，已經送過 (或正隨著播放請求送出) 就不必再送
+        version = voice.begin_sync()
+        if version is None:
             return None
 
+        with self.rest.tracer.span("node.update_voice", guild_id=guild_id, node=self.name, version=version):
+            if self.version == 4:
+                status = await self.rest.update_voice(guild_id, voice.payload())
+                if status not in (200, 204):
+                    voice.sync_failed(version)
+                return status
+            else:
+                await self._send_voice_v3(guild_id, voice)
+                return True
 
-        if self.version == 4:
-            return await self.rest.update_voice(
-                guild_id,
-                {
-                    "sessionId": voice.session_id,
-                    "token": voice.token,
-                    "endpoint": voice.endpoint,
-                },
-            )
-        else:
-            await self.ws.send({
-                "op": "voiceUpdate",
-                "guildId": str(guild_id),
-                "sessionId": voice.session_id,
-                "event": {
-                    "token": voice.token,
-                    "endpoint": voice.endpoint,
-                }
-            })
-            return True
+    async def _send_voice_v3(self, guild_id: int, voice: VoiceState):
+        await self.ws.send({
+            "op": "voiceUpdate",
+            "guildId": str(guild_id),
+            "sessionId": voice.session_id,
+            "event": {
+                "token": voice.token,
+                "endpoint": voice.endpoint,
+            }
+        })
 
-    async def play(self, guild_id: int, track: Union[Track, str, None], replace: bool = True):
+    async def play(self, guild_id: int, track: Union[Track, str, None], replace: bool = True, position: Optional[int] = None, volume: Optional[int] = None, paused: Optional[bool] = None, filters: Optional[dict] = None):
         encoded = track.encoded if isinstance(track, Track) else track
         
         if self.version == 4:
-            ready = await self.wait_ready(timeout=8.0)
+            self.writer.discard(guild_id, "position")
+            ready = await self.wait_ready(timeout=SESSION_TIMEOUT)
             if not ready:
                 _log.warning("[Node] Waiting for session_id timed out, cancelling play request")
                 return
             val = encoded if encoded else "STOP"
             voice_payload = None
             voice = self.get_voice(guild_id)
-            if voice.ready():
-                voice_payload = {
-                    "sessionId": voice.session_id,
-                    "token": voice.token,
-                    "endpoint": voice.endpoint
-                }
-                _log.info(f"[Node] Executing Atomic Play (with Voice credentials)")
+            # 只有節點還沒收到的憑證才跟著播放請求一起送
+            voice_version = voice.begin_sync()
+            if voice_version is not None:
+                voice_payload = voice.payload()
+                _log.info(f"[Node] Executing Atomic Play (with Voice credentials v{voice_version})")
             
             status = await self.rest.update_player(
                 guild_id, 
                 encoded_track=val, 
                 no_replace=not replace,
-                voice=voice_payload
+                voice=voice_payload,
+                position=position,
+                volume=volume,
+                paused=paused,
+                filters=filters
             )
             if status not in (200, 204):
+                if voice_version is not None:
+                    voice.sync_failed(voice_version)
                 _log.warning(f"[Node] update_player returned {status}, may not have played successfully")
         else:
             if not encoded:
                 await self.stop(guild_id)
             else:
-                await self.ws.send({
+                voice = self.get_voice(guild_id)
+                if voice.begin_sync() is not None:
+                    # v3 沒有原子操作，憑證要先用 voiceUpdate 送出
+                    await self._send_voice_v3(guild_id, voice)
+                payload = {
                     "op": "play",
                     "guildId": str(guild_id),
                     "track": encoded,
                     "noReplace": not replace
-                })
+                }
+                if position is not None: payload["startTime"] = position
+                if volume is not None: payload["volume"] = volume
+                if paused is not None: payload["pause"] = paused
+                await self.ws.send(payload)
+                if filters:
+                    await self.ws.send({"op": "filters", "guildId": str(guild_id), **filters})
 
     async def stop(self, guild_id: int):
         if self.version == 4:
+            self.writer.discard(guild_id, "position")
+            if not await self._wait_session(guild_id):
+                return None
             status = await self.rest.update_player(guild_id, encoded_track="STOP")
             if status and status not in (200, 204):
                 _log.warning(f"[Node] stop returned {status}")
+            return status
         else:
             await self.ws.send({"op": "stop", "guildId": str(guild_id)})
+            return True
+
+    async def destroy(self, guild_id: int):
+        self.writer.discard(guild_id, "volume", "paused", "position", "filters")
+        if self.version == 4:
+            if not await self._wait_session(guild_id):
+                if not self._closed:
+                    # 節點之後接回 session 時再清掉
+                    self.orphaned.add(guild_id)
+                return None
+            return await self.rest.destroy_player(guild_id)
+        else:
+            await self.ws.send({"op": "destroy", "guildId": str(guild_id)})
+            return True
+
+    def queue_update(self, guild_id: int, **fields) -> asyncio.Future:
+        return self.writer.submit(guild_id, **fields)
+
+    # 回傳值：v4 是節點的 HTTP 狀態 (送不出去為 None)，v3 送進 WebSocket 佇列後為 True
 
     async def set_volume(self, guild_id: int, volume: int):
         if self.version == 4:
-            await self.rest.update_player(guild_id, volume=volume)
+            return await self.queue_update(guild_id, volume=volume)
         else:
             await self.ws.send({"op": "volume", "guildId": str(guild_id), "volume": volume})
+            return True
 
     async def set_paused(self, guild_id: int, paused: bool):
         if self.version == 4:
-            await self.rest.update_player(guild_id, paused=paused)
+            return await self.queue_update(guild_id, paused=paused)
         else:
             await self.ws.send({"op": "pause", "guildId": str(guild_id), "pause": paused})
+            return True
 
     async def seek(self, guild_id: int, position_ms: int):
-
         if self.version == 4:
-            try:
-                await self.rest.update_player(guild_id, encoded_track=None, no_replace=False, volume=None, paused=None, voice=None)  # 先保留連線熱身
-            except Exception:
-                pass
-            await self.rest.update_player(guild_id)
+            return await self.queue_update(guild_id, position=position_ms)
         else:
             await self.ws.send({"op": "seek", "guildId": str(guild_id), "position": position_ms})
+            return True
+
+    async def set_filters(self, guild_id: int, filters: dict):
+        if self.version == 4:
+            return await self.queue_update(guild_id, filters=filters)
+        else:
+            await self.ws.send({"op": "filters", "guildId": str(guild_id), **filters})
+            return True
 
     async def _handle_payload(self, payload: dict):
         op = payload.get("op")
-        if op == "stats":
-            self.stats = payload
-        elif op == "playerUpdate":
-            try:
-                guild_id = int(payload.get("guildId", 0))
-            except Exception:
-                guild_id = 0
-            state = payload.get("state", {})
-            await self.dispatch("player_update", PlayerUpdateEvent(guild_id=guild_id, state=state))
-        elif op == "event":
-            await self._handle_event(payload)
-        elif op == "ready":
-            session_id = payload.get("sessionId")
-            _log.info(f"Lavalink Ready! Session ID: {session_id}")
-            if self.version == 4 and session_id:
-                self.rest.session_id = session_id
-                await self.rest.update_session(resuming=True)
+        counter = self._frame_counters.get(op)
+        if counter is None:
+            counter = self._frame_counters[op] = self.rest.metrics.ws_frames.labels(self.name, str(op))
+        counter.inc()
+        handler = self._OP_HANDLERS.get(op)
+        if handler is not None:
+            await handler(self, payload)
+
+    async def _on_stats(self, payload: dict):
+        self.stats = NodeStats.from_payload(payload)
+        await self.dispatch("node_stats", NodeStatsEvent(self.name, self.stats))
+
+    async def _on_player_update(self, payload: dict):
+        try:
+            guild_id = int(payload.get("guildId", 0))
+        except Exception:
+            guild_id = 0
+        state = PlayerState.from_payload(payload.get("state") or {})
+        await self.dispatch("player_update", PlayerUpdateEvent(guild_id, state))
+
+    async def _on_ready(self, payload: dict):
+        session_id = payload.get("sessionId")
+        self.resumed = bool(payload.get("resumed", False))
+        _log.info(f"Lavalink Ready! Session ID: {session_id} (resumed={self.resumed})")
+        if self.version == 4 and session_id:
+            self.ws.session_id = session_id
+            self.rest.session_id = session_id
+            self._session_ready.set()
+            self._held.clear()
+            await self.rest.update_session(resuming=True)
+        elif self.version != 4:
+            # v3 斷線期間排隊的 op 是給舊 session 的，沒接回就不能重送
+            if self._had_session and not self.resumed:
+                dropped = self.ws.clear_outbox()
+                if dropped:
+                    _log.info(f"[Node] {self.name} dropped {dropped} queued ops for the previous session")
+            await self.ws.flush_outbox()
+        self._had_session = True
+        await self.dispatch("node_ready", NodeReadyEvent(self.name, session_id, self.resumed))
 
     async def _handle_event(self, payload: dict):
-        event_type = payload.get("type")
-        guild_id = int(payload.get("guildId", 0))
-        event = None
-        if event_type == "TrackStartEvent":
-            event = TrackStartEvent(guild_id=guild_id, track=payload.get("track"))
-            await self.dispatch("track_start", event)
-        elif event_type == "TrackEndEvent":
-            event = TrackEndEvent(guild_id=guild_id, track=payload.get("track"), reason=payload.get("reason"))
-            await self.dispatch("track_end", event)
-        elif event_type == "TrackExceptionEvent":
-            event = TrackExceptionEvent(guild_id=guild_id, track=payload.get("track"), exception=payload.get("exception"))
-            await self.dispatch("track_exception", event)
-        elif event_type == "TrackStuckEvent":
-            event = TrackStuckEvent(guild_id=guild_id, track=payload.get("track"), threshold_ms=payload.get("thresholdMs"))
-            await self.dispatch("track_stuck", event)
-        elif event_type == "WebSocketClosedEvent":
-            event = WebSocketClosedEvent(guild_id=guild_id, code=payload.get("code"), reason=payload.get("reason"), by_remote=payload.get("byRemote"))
-            await self.dispatch("websocket_closed", event)
+        parser = _EVENT_PARSERS.get(payload.get("type"))
+        if parser is None:
+            return
+        event_name, build = parser
+        await self.dispatch(event_name, build(int(payload.get("guildId", 0)), payload))
+
+    _OP_HANDLERS = {
+        "stats": _on_stats,
+        "playerUpdate": _on_player_update,
+        "event": _handle_event,
+        "ready": _on_ready,
+    }
+
+
+def _track(payload: dict) -> Optional[Track]:
+    data = payload.get("track")
+    if not data:
+        return None
+    try:
+        return Track.from_payload(data)
+    except TrackDecodeError as e:
+        _log.warning(f"[Node] Could not decode event track: {e}")
+        return None
+
+
+_EVENT_PARSERS = {
+    "TrackStartEvent": ("track_start", lambda gid, p: TrackStartEvent(gid, _track(p))),
+    "TrackEndEvent": ("track_end", lambda gid, p: TrackEndEvent(gid, p.get("reason"), _track(p))),
+    "TrackExceptionEvent": ("track_exception", lambda gid, p: TrackExceptionEvent(gid, _track(p), p.get("exception"))),
+    "TrackStuckEvent": ("track_stuck", lambda gid, p: TrackStuckEvent(gid, _track(p), p.get("thresholdMs"))),
+    "WebSocketClosedEvent": ("websocket_closed", lambda gid, p: WebSocketClosedEvent(gid, p.get("code"), p.get("reason"), p.get("byRemote"))),
+}
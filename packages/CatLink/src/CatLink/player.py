@@ -1,61 +1,306 @@
 import asyncio
 import logging
-from collections import deque
-from typing import Optional
-from .models import Track
+import time
+from typing import Optional, Dict, Any, Union
+from .models import Track, LazyTrack, PlayerState
 from .node import Node
+from .queue import TrackQueue
+from .decoder import decode_track
+from .errors import TrackDecodeError
 
 _log = logging.getLogger(__name__)
 
 class Player:
-    def __init__(self, guild_id: int, node: Node):
+    def __init__(self, guild_id: int, node: Node, compact_queue: bool = False):
         self.guild_id = guild_id
         self.node = node
-        self.queue: deque[Track] = deque()
+        self.queue: TrackQueue = TrackQueue(compact=compact_queue)
         self.current: Optional[Track] = None
         self.loop: bool = False
         self.paused: bool = False
         self.volume: int = 100
-        self.position: int = 0
+        self.speed: float = 1.0
+        self.filters: Dict[str, Any] = {}
+        self.connected: bool = False
+        self.ping: int = -1
+        self.last_update: int = 0
+        self._position: int = 0
+        self._position_at: float = time.monotonic()
+        self._staged: Optional[Track] = None
+        self._prefetch_task: Optional[asyncio.Task] = None
+        # 欄位 -> [尚未完成的請求數, 節點最後確認的值]
+        self._unconfirmed: Dict[str, list] = {}
 
     @property
     def is_playing(self) -> bool:
         return self.current is not None
 
-    async def play(self, track: Track, replace: bool = False):
+    @property
+    def position(self) -> int:
+        # 以最後一次 playerUpdate 為基準往後推算，不必等下一次更新
+        if self.current is None or self.paused:
+            return self._position
+        elapsed = (time.monotonic() - self._position_at) * 1000 * self.speed
+        position = self._position + int(elapsed)
+        length = self.current.length
+        if length and not self.current.is_stream:
+            position = min(position, length)
+        return position
+
+    @position.setter
+    def position(self, value: int):
+        self._position = int(value)
+        self._position_at = time.monotonic()
+
+    def update_state(self, state: PlayerState):
+        # 亂序抵達的舊更新直接忽略
+        if state.time and state.time < self.last_update:
+            return
+        self.last_update = state.time
+        self.connected = state.connected
+        self.ping = state.ping
+        self.position = state.position or 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        voice = self.node.voice_states.get(self.guild_id)
+        return {
+            "node": self.node.name,
+            "current": self.current.encoded if self.current else None,
+            "position": self.position,
+            "volume": self.volume,
+            "paused": self.paused,
+            "loop": self.loop,
+            "queue": [t.to_dict() if isinstance(t, LazyTrack) else t.encoded for t in self.queue],
+            "voice": {
+                "session_id": voice.session_id,
+                "token": voice.token,
+                "endpoint": voice.endpoint,
+            } if voice else None,
+        }
+
+    def restore(self, data: Dict[str, Any], merge: bool = False):
+        # merge：player 在節點 ready 前就已建立，只補上還沒有的狀態，之後加入的歌排在保存的佇列後面
+        if not merge or self.current is None:
+            current = data.get("current")
+            try:
+                self.current = decode_track(current) if current else None
+            except TrackDecodeError as e:
+                _log.warning(f"[Player] Could not restore current track (guild={self.guild_id}): {e}")
+                self.current = None
+            self.position = int(data.get("position") or 0)
+            self.volume = int(data.get("volume", 100))
+            self.paused = bool(data.get("paused", False))
+            self.loop = bool(data.get("loop", False))
+        added = list(self.queue) if merge else []
+        self.queue.clear()
+        for item in data.get("queue") or []:
+            try:
+                self.queue.append(LazyTrack(**item) if isinstance(item, dict) else decode_track(item))
+            except (TypeError, TrackDecodeError) as e:
+                # 格式不對的項目跳過，不影響其他項目
+                _log.warning(f"[Player] Skipping unrestorable queue entry (guild={self.guild_id}): {e}")
+        self.queue.extend(added)
+        voice_data = data.get("voice")
+        voice = self.node.voice_states.get(self.guild_id)
+        if voice_data and not (merge and voice is not None and voice.session_id):
+            voice = self.node.get_voice(self.guild_id)
+            voice.session_id = voice_data.get("session_id")
+            voice.token = voice_data.get("token")
+            voice.endpoint = voice_data.get("endpoint")
+
+    async def play(self, track: Union[Track, LazyTrack], replace: bool = False):
         if replace or not self.is_playing:
+            if isinstance(track, LazyTrack):
+                track = await self._resolve(track)
+                if track is None:
+                    return
             await self._perform_play(track)
         else:
             self.queue.append(track)
 
-    async def _perform_play(self, track: Track):
+    async def _resolve(self, entry: LazyTrack) -> Optional[Track]:
+        try:
+            tracks = await self.node.rest.load_tracks(entry.load_identifier)
+        except Exception as e:
+            _log.warning(f"[Player] Failed to resolve {entry.query!r} (guild={self.guild_id}): {e}")
+            return None
+        if not tracks:
+            _log.warning(f"[Player] No result for {entry.query!r}, skipping (guild={self.guild_id})")
+            return None
+        return tracks[0]
+
+    def _replace_entry(self, entry: LazyTrack, track: Optional[Track]):
+        # 解析期間佇列可能被改動，用物件本身找回目前的位置
+        for index, current in enumerate(self.queue):
+            if current is entry:
+                if track is None:
+                    del self.queue[index]
+                else:
+                    self.queue[index] = track
+                return
+
+    async def _next_track(self) -> Optional[Track]:
+        while self.queue:
+            entry = self.queue.popleft()
+            if not isinstance(entry, LazyTrack):
+                return entry
+            track = await self._resolve(entry)
+            if track is not None:
+                return track
+        return None
+
+    async def _perform_play(self, track: Track, staged: bool = False):
+        # staged：已在 prefetch 驗證過、語音憑證也齊全，直接送出單一 PATCH
         self.current = track
         self.paused = False
         self.position = 0
-        voice = self.node.get_voice(self.guild_id)
-        if not voice.ready():
-            _log.info(f"[Player] Waiting for voice credentials (Max 4s)...")
-            for _ in range(40):
+        tracer = self.node.rest.tracer
+        scope = tracer.span("player.play", guild_id=self.guild_id, track=track.identifier, node=self.node.name, staged=staged) if tracer.enabled else tracer.NOOP
+        with scope as span:
+            if not staged:
+                voice = self.node.get_voice(self.guild_id)
+                if not voice.ready():
+                    _log.info(f"[Player] Waiting for voice credentials (Max 4s)...")
+                    with tracer.span("voice.wait_credentials") as wait_span:
+                        wait_span.set("ready", await voice.wait_ready(timeout=4.0))
+                
                 if voice.ready():
-                    break
-                await asyncio.sleep(0.1)
-        
-        if voice.ready():
-            _log.info(f"[Player] Voice credentials ready, preparing to send Atomic Play Request")
+                    # 尚未同步的憑證由 Node.play 併進同一個播放請求
+                    _log.info(f"[Player] Voice credentials ready, preparing to send Atomic Play Request")
+                else:
+                    _log.warning(f"[Player] Waiting for voice credentials timed out, attempting to play without credentials (may fail)")
+            await self.node.play(self.guild_id, track)
+            # TrackStartEvent 由另一個 task 收到，到時再補上 first_audio
+            tracer.expect(self.guild_id, span)
+
+    @staticmethod
+    def _valid(track: Any) -> bool:
+        if not isinstance(track, Track) or not track.encoded:
+            return False
+        try:
+            decode_track(track.encoded)
+        except TrackDecodeError:
+            return False
+        return True
+
+    async def prefetch(self, count: int = 3):
+        # 視窗內尚未解析的項目先併發查詢，結果原地替換
+        lazy = [e for e in self.queue.window(0, count) if isinstance(e, LazyTrack)]
+        if lazy:
+            resolved = await asyncio.gather(*(self._resolve(e) for e in lazy))
+            for entry, track in zip(lazy, resolved):
+                self._replace_entry(entry, track)
+        # 檢查接下來的 count 首，無法播放的直接移出佇列
+        index = 0
+        while index < min(count, len(self.queue)):
+            entry = self.queue[index]
+            if isinstance(entry, LazyTrack):
+                # 查詢期間才移進視窗的項目
+                self._replace_entry(entry, await self._resolve(entry))
+                continue
+            if self._valid(entry):
+                index += 1
+                continue
+            _log.warning(f"[Player] Dropping unplayable queue entry {index} (guild={self.guild_id})")
+            del self.queue[index]
+        self._staged = self.queue[0] if self.queue else None
+        if self._staged is not None:
+            await self.node.rest.warm()
+
+    def start_prefetch(self, count: int = 3):
+        if self._prefetch_task is not None and not self._prefetch_task.done():
+            return
+        self._prefetch_task = asyncio.create_task(self._run_prefetch(count))
+
+    def cancel_prefetch(self):
+        if self._prefetch_task is not None:
+            self._prefetch_task.cancel()
+            self._prefetch_task = None
+        self._staged = None
+
+    async def _run_prefetch(self, count: int):
+        try:
+            await self.prefetch(count)
+        except Exception as e:
+            _log.warning(f"[Player] Prefetch failed (guild={self.guild_id}): {e}")
+
+    async def resync(self):
+        if self.current is None:
+            return
+        # 斷線期間排隊中的變更也一起帶上，避免被還沒更新的本地狀態蓋掉
+        queued = self.node.writer.outstanding(self.guild_id)
+        await self.node.play(
+            self.guild_id,
+            self.current,
+            replace=True,
+            position=queued.get("position", self.position),
+            volume=queued.get("volume", self.volume),
+            paused=queued.get("paused", self.paused),
+            filters=queued.get("filters", self.filters or None)
+        )
+
+    def rebind(self, node: Node):
+        # 還沒開始播放的 player 直接改綁節點；舊節點上還沒有它的狀態，不必清理
+        old = self.node
+        if node is old:
+            return
+        old.writer.transfer(self.guild_id, node.writer)
+        old.release(self.guild_id)
+        voice = old.voice_states.pop(self.guild_id, None)
+        if voice is not None:
+            voice.invalidate()
+            node.voice_states[self.guild_id] = voice
+        self.node = node
+        self.last_update = 0
+
+    async def move_to(self, node: Node):
+        if node is self.node:
+            return
+        old = self.node
+        _log.info(f"[Player] Moving guild {self.guild_id} from {old.name} to {node.name}")
+        old.writer.transfer(self.guild_id, node.writer)
+        voice = old.voice_states.pop(self.guild_id, None)
+        if voice is not None:
+            # 新節點還沒收到過這組憑證
+            voice.invalidate()
+            node.voice_states[self.guild_id] = voice
+        self.node = node
+        # 新節點的時間戳與舊節點無關
+        self.last_update = 0
+        if old.available:
             try:
-                await self.node.update_voice(self.guild_id)
+                await old.destroy(self.guild_id)
             except Exception as e:
-                _log.warning(f"[Player] Pre-sync voice failed: {e}")
+                _log.warning(f"[Player] Failed to destroy player on {old.name}: {e}")
         else:
-            _log.warning(f"[Player] Waiting for voice credentials timed out, attempting to play without credentials (may fail)")
-        await self.node.play(self.guild_id, track)
+            old.orphaned.add(self.guild_id)
+        try:
+            if self.current is not None:
+                # 憑證會跟著 resync 的播放請求一起送出
+                await self.resync()
+            elif voice is not None:
+                await node.update_voice(self.guild_id)
+        finally:
+            # 還卡在舊節點等 session 的請求 (例如 stop) 放行，在新的播放狀態送出後才改送新節點
+            old.release(self.guild_id)
 
     async def stop(self):
+        # 佇列只存在本地，直接清掉；播放狀態等節點確認後才更新
         self.queue.clear()
-        self.current = None
-        self.paused = False
-        self.position = 0
-        await self.node.stop(self.guild_id)
+        self._staged = None
+        node = self.node
+        status = await node.stop(self.guild_id)
+        if not self._accepted(status) and self.node is not node:
+            # 等待期間 player 被搬到其他節點，改對新節點送出
+            status = await self.node.stop(self.guild_id)
+        if self._accepted(status):
+            self.current = None
+            self.paused = False
+            self.position = 0
+
+    @staticmethod
+    def _accepted(status: Any) -> bool:
+        return status in (True, 200, 204)
 
     async def handle_track_end(self, reason: str):
         prev = self.current
@@ -66,15 +311,22 @@ class Player:
             return
         if reason == "finished" or reason == "loadFailed":
             if self.loop and prev:
+                # 循環播放不會從佇列取歌，預先準備的那首留到下次可能已經過時
+                self._staged = None
                 await self._perform_play(prev)
                 return
-            if self.queue:
-                next_track = self.queue.popleft()
-                await self._perform_play(next_track)
+            next_track = await self._next_track()
+            if next_track is not None:
+                staged, self._staged = self._staged, None
+                if staged is not None and staged.encoded == next_track.encoded and self.node.get_voice(self.guild_id).ready():
+                    await self._perform_play(next_track, staged=True)
+                else:
+                    await self._perform_play(next_track)
 
     async def skip(self):
-        if self.queue:
-            next_track = self.queue.popleft()
+        self._staged = None
+        next_track = await self._next_track()
+        if next_track is not None:
             self.current = next_track
             self.position = 0
             await self.node.play(self.guild_id, next_track, replace=True)
@@ -82,19 +334,58 @@ class Player:
             self.current = None
             await self.node.stop(self.guild_id)
 
+    async def _optimistic(self, fields: Dict[str, Any], request) -> Any:
+        # 先更新本地狀態，連點時後續的呼叫才會以最新的值為基準；節點拒絕時退回最後確認的值
+        for name, value in fields.items():
+            state = self._unconfirmed.get(name)
+            if state is None:
+                state = self._unconfirmed[name] = [0, getattr(self, name)]
+            state[0] += 1
+            setattr(self, name, value)
+        status = None
+        try:
+            status = await request
+        finally:
+            accepted = self._accepted(status)
+            for name, value in fields.items():
+                state = self._unconfirmed[name]
+                state[0] -= 1
+                if accepted:
+                    state[1] = value
+                if state[0] == 0:
+                    # 同一批合併送出的請求裡，最後一個負責退回
+                    del self._unconfirmed[name]
+                    if not accepted:
+                        setattr(self, name, state[1])
+        return status
+
     async def set_volume(self, volume: int):
         v = max(0, min(1000, int(volume)))
-        await self.node.set_volume(self.guild_id, v)
-        self.volume = v
+        return await self._optimistic({"volume": v}, self.node.set_volume(self.guild_id, v))
 
     async def pause(self):
-        await self.node.set_paused(self.guild_id, True)
-        self.paused = True
+        # 先把推算的位置固定下來再標記暫停
+        self.position = self.position
+        return await self._optimistic({"paused": True}, self.node.set_paused(self.guild_id, True))
 
     async def resume(self):
-        await self.node.set_paused(self.guild_id, False)
-        self.paused = False
+        self.position = self.position
+        return await self._optimistic({"paused": False}, self.node.set_paused(self.guild_id, False))
 
     async def seek(self, position_ms: int):
-        await self.node.rest.update_player(self.guild_id, position=position_ms)
-        self.position = int(position_ms)
+        return await self._optimistic({"position": int(position_ms)}, self.node.seek(self.guild_id, int(position_ms)))
+
+    async def set_filters(self, filters: Dict[str, Any]):
+        # filter 一律經過 player 設定，節點重建 player 時 resync 才能帶上完整的 filter
+        filters = dict(filters)
+        speed = float((filters.get("timescale") or {}).get("speed", 1.0))
+        if speed <= 0:
+            raise ValueError(f"timescale speed must be positive, got {speed}")
+        # 位置推算跟著新的速度走
+        self.position = self.position
+        return await self._optimistic({"speed": speed, "filters": filters}, self.node.set_filters(self.guild_id, filters))
+
+    async def set_speed(self, speed: float):
+        # 只改 timescale 的速度，其他 filter 保持不變
+        timescale = {**(self.filters.get("timescale") or {}), "speed": float(speed)}
+        return await self.set_filters({**self.filters, "timescale": timescale})
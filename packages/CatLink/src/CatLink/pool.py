@@ -0,0 +1,111 @@
+import logging
+from typing import Dict, List, Optional, Set
+from .node import Node
+from .errors import LavalinkConnectionError
+
+_log = logging.getLogger(__name__)
+
+
+class NodePool:
+    def __init__(self):
+        self.nodes: List[Node] = []
+        self._guild_nodes: Dict[int, Node] = {}
+        # 各節點目前分配到的 guild 數；stats 約一分鐘才來一次，短時間內的分配靠它分散
+        self._assigned: Dict[str, int] = {}
+        # 沒有節點可用時暫放在主節點的 guild
+        self._provisional: Set[int] = set()
+
+    def add_node(self, node: Node) -> Node:
+        self.nodes.append(node)
+        _log.info(f"[Pool] Added node {node.name} ({len(self.nodes)} total)")
+        return node
+
+    def remove_node(self, node: Node):
+        if node in self.nodes:
+            self.nodes.remove(node)
+        for guild_id in [g for g, n in self._guild_nodes.items() if n is node]:
+            del self._guild_nodes[guild_id]
+            self._provisional.discard(guild_id)
+        self._assigned.pop(node.name, None)
+
+    @property
+    def primary(self) -> Node:
+        if not self.nodes:
+            raise LavalinkConnectionError("No nodes have been added to the pool")
+        return self.nodes[0]
+
+    def penalty(self, node: Node) -> float:
+        if not node.available:
+            return float("inf")
+        assigned = self._assigned.get(node.name, 0)
+        stats = node.stats
+        if stats is None:
+            return float(assigned)
+        players = max(stats.playing_players, assigned)
+        cpu_penalty = 1.05 ** (100 * stats.lavalink_load) * 10 - 10
+        deficit_penalty = 1.03 ** (500 * (stats.frames_deficit / 3000)) * 600 - 600
+        null_penalty = (1.03 ** (500 * (stats.frames_nulled / 3000)) * 300 - 300) * 2
+        return players + cpu_penalty + deficit_penalty + null_penalty
+
+    def best_node(self, exclude: Optional[Node] = None) -> Node:
+        candidates = [n for n in self.nodes if n is not exclude]
+        if not candidates:
+            if exclude is not None:
+                raise LavalinkConnectionError(f"No node other than {exclude.name} in the pool")
+            raise LavalinkConnectionError("No nodes have been added to the pool")
+        best = min(candidates, key=self.penalty)
+        if not best.available and exclude is None:
+            # 全部節點都不可用時仍回傳主節點，讓呼叫端照舊等待 session 就緒
+            return self.primary
+        return best
+
+    def get_node(self, guild_id: int) -> Optional[Node]:
+        return self._guild_nodes.get(guild_id)
+
+    def node_for(self, guild_id: int) -> Node:
+        node = self._guild_nodes.get(guild_id)
+        if node is not None and guild_id in self._provisional:
+            node = self._replace(guild_id, node)
+        if node is None:
+            node = self.best_node()
+            self._place(guild_id, node)
+            if not node.available:
+                self._provisional.add(guild_id)
+            _log.debug(f"[Pool] Guild {guild_id} placed on node {node.name}")
+        return node
+
+    def _replace(self, guild_id: int, node: Node) -> Node:
+        # 暫放的 guild 在有節點恢復後重新挑一次，而不是一直綁在主節點上
+        if node.available:
+            self._provisional.discard(guild_id)
+            return node
+        best = self.best_node()
+        if not best.available:
+            return node
+        self._provisional.discard(guild_id)
+        self._place(guild_id, best)
+        voice = node.voice_states.pop(guild_id, None)
+        if voice is not None:
+            voice.invalidate()
+            best.voice_states[guild_id] = voice
+        _log.debug(f"[Pool] Guild {guild_id} re-placed from {node.name} to {best.name}")
+        return best
+
+    def _place(self, guild_id: int, node: Node):
+        previous = self._guild_nodes.get(guild_id)
+        if previous is node:
+            return
+        if previous is not None:
+            self._assigned[previous.name] -= 1
+        self._guild_nodes[guild_id] = node
+        self._assigned[node.name] = self._assigned.get(node.name, 0) + 1
+
+    def assign(self, guild_id: int, node: Node):
+        self._provisional.discard(guild_id)
+        self._place(guild_id, node)
+
+    def release(self, guild_id: int):
+        self._provisional.discard(guild_id)
+        node = self._guild_nodes.pop(guild_id, None)
+        if node is not None:
+            self._assigned[node.name] -= 1
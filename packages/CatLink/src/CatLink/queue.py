@@ -0,0 +1,291 @@
+import random
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from .models import Track
+from .compact import PackedTrack, pack, unpack, estimate_size
+
+
+def _track_key(track: Any) -> Any:
+    return getattr(track, "identifier", None) or getattr(track, "encoded", None) or getattr(track, "query", None) or id(track)
+
+
+class TrackQueue:
+    """
+    分塊儲存的播放佇列：
+    以 Fenwick tree 記錄每塊長度，索引/插入/刪除/移動都是 O(log n) 定位加上塊內 O(load) 搬移，
+    len 是 O(1)，分頁用的 window 只會走訪需要的那幾塊。
+    compact=True 時 Track 會以 PackedTrack 保存，存取時才還原成 Track。
+    """
+    _LOAD = 256
+
+    def __init__(self, iterable: Iterable[Any] = (), compact: bool = False):
+        self.compact = compact
+        self._blocks: List[List[Any]] = []
+        self._tree: List[int] = [0]
+        self._len = 0
+        self._counts: Dict[Any, int] = {}
+        self._unshuffled: Optional[List[Any]] = None
+        self.extend(iterable)
+
+    # Fenwick tree
+
+    def _rebuild(self):
+        n = len(self._blocks)
+        tree = [0] * (n + 1)
+        for i, block in enumerate(self._blocks, 1):
+            tree[i] += len(block)
+            parent = i + (i & -i)
+            if parent <= n:
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, block_index: int, delta: int):
+        i = block_index + 1
+        tree = self._tree
+        n = len(tree)
+        while i < n:
+            tree[i] += delta
+            i += i & -i
+
+    def _locate(self, index: int):
+        tree = self._tree
+        n = len(tree) - 1
+        pos = 0
+        step = 1 << (n.bit_length() - 1) if n else 0
+        while step:
+            nxt = pos + step
+            if nxt <= n and tree[nxt] <= index:
+                pos = nxt
+                index -= tree[nxt]
+            step >>= 1
+        return pos, index
+
+    def _normalize(self, index: int) -> int:
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("queue index out of range")
+        return index
+
+    def _pack(self, track: Any) -> Any:
+        if self.compact and isinstance(track, Track):
+            return pack(track)
+        return track
+
+    @staticmethod
+    def _unpack(entry: Any) -> Any:
+        return unpack(entry) if isinstance(entry, PackedTrack) else entry
+
+    def _entries(self) -> Iterator[Any]:
+        for block in self._blocks:
+            yield from block
+
+    # 重複曲目索引
+
+    def _count_add(self, track: Any):
+        key = _track_key(track)
+        self._counts[key] = self._counts.get(key, 0) + 1
+
+    def _count_remove(self, track: Any):
+        key = _track_key(track)
+        remaining = self._counts.get(key, 0) - 1
+        if remaining > 0:
+            self._counts[key] = remaining
+        else:
+            self._counts.pop(key, None)
+
+    def _delete_at(self, block_index: int, offset: int) -> Any:
+        block = self._blocks[block_index]
+        entry = block.pop(offset)
+        self._len -= 1
+        self._count_remove(entry)
+        if block:
+            self._tree_add(block_index, -1)
+        else:
+            del self._blocks[block_index]
+            self._rebuild()
+        return self._unpack(entry)
+
+    # deque 相容介面
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __bool__(self) -> bool:
+        return self._len > 0
+
+    def __iter__(self) -> Iterator[Any]:
+        if not self.compact:
+            return self._entries()
+        return map(self._unpack, self._entries())
+
+    def __contains__(self, track: Any) -> bool:
+        return _track_key(track) in self._counts
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._len)
+            if step != 1:
+                return list(self)[index]
+            return self.window(start, stop)
+        block_index, offset = self._locate(self._normalize(index))
+        return self._unpack(self._blocks[block_index][offset])
+
+    def __setitem__(self, index: int, track: Any):
+        block_index, offset = self._locate(self._normalize(index))
+        block = self._blocks[block_index]
+        self._count_remove(block[offset])
+        block[offset] = entry = self._pack(track)
+        self._count_add(entry)
+
+    def __delitem__(self, index: int):
+        self.pop(index)
+
+    def __repr__(self) -> str:
+        return f"<TrackQueue len={self._len} blocks={len(self._blocks)}>"
+
+    def append(self, track: Any):
+        track = self._pack(track)
+        if not self._blocks or len(self._blocks[-1]) >= self._LOAD:
+            self._blocks.append([track])
+            self._rebuild()
+        else:
+            self._blocks[-1].append(track)
+            self._tree_add(len(self._blocks) - 1, 1)
+        self._len += 1
+        self._count_add(track)
+
+    def appendleft(self, track: Any):
+        self.insert(0, track)
+
+    def extend(self, tracks: Iterable[Any]):
+        for track in tracks:
+            self.append(track)
+
+    def insert(self, index: int, track: Any):
+        if index < 0:
+            index = max(0, index + self._len)
+        if index >= self._len:
+            self.append(track)
+            return
+        track = self._pack(track)
+        block_index, offset = self._locate(index)
+        block = self._blocks[block_index]
+        block.insert(offset, track)
+        self._len += 1
+        self._count_add(track)
+        if len(block) > self._LOAD * 2:
+            half = len(block) // 2
+            self._blocks[block_index:block_index + 1] = [block[:half], block[half:]]
+            self._rebuild()
+        else:
+            self._tree_add(block_index, 1)
+
+    def pop(self, index: int = -1) -> Any:
+        if not self._len:
+            raise IndexError("pop from an empty queue")
+        block_index, offset = self._locate(self._normalize(index))
+        return self._delete_at(block_index, offset)
+
+    def popleft(self) -> Any:
+        if not self._len:
+            raise IndexError("pop from an empty queue")
+        return self._delete_at(0, 0)
+
+    def index(self, track: Any) -> int:
+        if self.compact:
+            for i, entry in enumerate(self):
+                if entry == track:
+                    return i
+            raise ValueError("track is not in queue")
+        base = 0
+        for block in self._blocks:
+            try:
+                return base + block.index(track)
+            except ValueError:
+                base += len(block)
+        raise ValueError("track is not in queue")
+
+    def remove(self, track: Any):
+        self.pop(self.index(track))
+
+    def move(self, src: int, dst: int):
+        block_index, offset = self._locate(self._normalize(src))
+        entry = self._blocks[block_index][offset]
+        self.pop(src)
+        self.insert(dst, entry)
+
+    def clear(self):
+        self._blocks = []
+        self._tree = [0]
+        self._len = 0
+        self._counts.clear()
+        self._unshuffled = None
+
+    def window(self, start: int, stop: int) -> List[Any]:
+        start = max(0, start)
+        stop = min(stop, self._len)
+        if start >= stop:
+            return []
+        block_index, offset = self._locate(start)
+        out: List[Any] = []
+        need = stop - start
+        while need > 0:
+            chunk = self._blocks[block_index][offset:offset + need]
+            out.extend(map(self._unpack, chunk) if self.compact else chunk)
+            need -= len(chunk)
+            block_index += 1
+            offset = 0
+        return out
+
+    def count(self, track: Any) -> int:
+        return self._counts.get(_track_key(track), 0)
+
+    def duplicates(self) -> Dict[Any, int]:
+        return {key: n for key, n in self._counts.items() if n > 1}
+
+    def memory_usage(self) -> Dict[str, float]:
+        total = estimate_size(self._entries())
+        return {
+            "tracks": self._len,
+            "bytes": total,
+            "bytes_per_track": total / self._len if self._len else 0.0,
+        }
+
+    # 隨機播放
+
+    @property
+    def is_shuffled(self) -> bool:
+        return self._unshuffled is not None
+
+    def _reset_blocks(self, tracks: List[Any]):
+        load = self._LOAD
+        self._blocks = [tracks[i:i + load] for i in range(0, len(tracks), load)]
+        self._rebuild()
+
+    def shuffle(self, rng: Optional[random.Random] = None):
+        tracks = list(self._entries())
+        if self._unshuffled is None:
+            self._unshuffled = list(tracks)
+        (rng or random).shuffle(tracks)
+        self._reset_blocks(tracks)
+
+    def unshuffle(self):
+        if self._unshuffled is None:
+            return
+        remaining: Dict[int, int] = {}
+        for track in self._entries():
+            remaining[id(track)] = remaining.get(id(track), 0) + 1
+        ordered = []
+        for track in self._unshuffled:
+            n = remaining.get(id(track), 0)
+            if n:
+                ordered.append(track)
+                remaining[id(track)] = n - 1
+        # 打亂後才加入的曲目依目前順序接在後面
+        for track in self._entries():
+            n = remaining.get(id(track), 0)
+            if n:
+                ordered.append(track)
+                remaining[id(track)] = n - 1
+        self._unshuffled = None
+        self._reset_blocks(ordered)
@@ -3,8 +3,13 @@ import logging
 import asyncio
 import socket
 import sys
-from typing import Optional, List, Dict, Any, Union
+import time
+from typing import Optional, List, Dict, Any, Union, Tuple
 from .models import Track
+from .cache import TrackCache, normalize_identifier
+from .codec import JSONCodec, get_codec
+from .metrics import Metrics
+from .tracing import Tracer
 
 _log = logging.getLogger(__name__)
 
@@ -17,13 +22,14 @@ DEFAULT_TIMEOUT = aiohttp.ClientTimeout(
 )
 
 class RestClient:
-    def __init__(self, host: str, port: int, password: str, user_id: int, secure: bool = False, version: int = 4):
+    def __init__(self, host: str, port: int, password: str, user_id: int, secure: bool = False, version: int = 4, cache: Optional[TrackCache] = None, codec: Optional[JSONCodec] = None, metrics: Optional[Metrics] = None, tracer: Optional[Tracer] = None):
         protocol = "https" if secure else "http"
         self.version = version
+        self.root = f"{protocol}://{host}:{port}"
         if version == 4:
-            self.base = f"{protocol}://{host}:{port}/v4"
+            self.base = f"{self.root}/v4"
         else:
-            self.base = f"{protocol}://{host}:{port}"
+            self.base = self.root
         self.headers = {
             "Authorization": password,
             "User-Id": str(user_id),
@@ -32,6 +38,12 @@ class RestClient:
         }
         self.session: Optional[aiohttp.ClientSession] = None
         self.session_id: Optional[str] = None
+        self.cache = cache if cache is not None else TrackCache()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.codec = codec or get_codec()
+        self.last_used = 0.0
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.tracer = tracer if tracer is not None else Tracer()
 
     async def start(self):
         if self.session is None:
@@ -47,7 +59,8 @@ class RestClient:
             self.session = aiohttp.ClientSession(
                 headers=self.headers, 
                 connector=conn,
-                timeout=DEFAULT_TIMEOUT
+                timeout=DEFAULT_TIMEOUT,
+                trace_configs=[self.tracer.trace_config()]
             )
 
     async def close(self):
@@ -60,7 +73,7 @@ class RestClient:
         try:
             async with self.session.patch(
                 f"{self.base}/sessions/{self.session_id}",
-                json={"resuming": resuming, "timeout": timeout},
+                data=self.codec.dumps_bytes({"resuming": resuming, "timeout": timeout}),
             ) as resp:
                 await resp.text()
                 if resp.status != 200:
@@ -68,9 +81,52 @@ class RestClient:
         except Exception as e:
             _log.error(f"Error updating session: {e}")
 
-    async def load_tracks(self, identifier: str) -> List[Track]:
+    async def warm(self, idle: float = 10.0) -> bool:
+        # 連線閒置一段時間才送個輕量請求，讓 keep-alive 連線在換歌前保持可用
+        if self.session is None or time.monotonic() - self.last_used < idle:
+            return False
+        self.last_used = time.monotonic()
+        try:
+            async with self.session.get(f"{self.root}/version", timeout=aiohttp.ClientTimeout(total=5)) as resp:
+                await resp.read()
+                return resp.status == 200
+        except Exception as e:
+            _log.debug(f"[REST] Warm-up request failed: {e}")
+            return False
+
+    async def load_tracks(self, identifier: str, use_cache: bool = True) -> List[Track]:
+        if use_cache:
+            cached = self.cache.get(identifier)
+            if cached is not None:
+                _log.debug(f"[REST] Cache hit: {identifier}")
+                return list(cached)
+
+        key = normalize_identifier(identifier)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load_and_cache(identifier))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._inflight.pop(key) if self._inflight.get(key) is t else None)
+        else:
+            _log.debug(f"[REST] Joined in-flight load: {identifier}")
+        # shield 讓單一呼叫端被取消時不會連帶取消其他人共用的請求
+        tracks = await asyncio.shield(task)
+        return list(tracks)
+
+    async def _load_and_cache(self, identifier: str) -> List[Track]:
+        result = await self._fetch_tracks(identifier)
+        if result is None:
+            return []
+        load_type, tracks = result
+        self.cache.put(identifier, load_type, tracks)
+        return tracks
+
+    async def _fetch_tracks(self, identifier: str) -> Optional[Tuple[Optional[str], List[Track]]]:
         url = f"{self.base}/loadtracks"
         _log.info(f"[REST] Searching: {identifier}")
+        self.last_used = time.monotonic()
+        metrics = self.metrics
+        start = time.perf_counter()
         
         try:
             async with self.session.get(
@@ -78,18 +134,27 @@ class RestClient:
                 params={"identifier": identifier},
                 timeout=aiohttp.ClientTimeout(total=45, connect=20, sock_read=30)
             ) as resp:
-                data = await resp.json()
+                data = self.codec.loads(await resp.read())
+                metrics.rest_latency.labels("loadtracks", str(resp.status)).observe(time.perf_counter() - start)
                 if resp.status != 200:
                     _log.error(f"Load tracks failed: {resp.status}")
-                    return []
+                    return None
+        except asyncio.TimeoutError:
+            metrics.rest_latency.labels("loadtracks", "timeout").observe(time.perf_counter() - start)
+            metrics.rest_timeouts.labels("loadtracks").inc()
+            _log.error(f"[REST] Search timed out: {identifier}")
+            return None
         except Exception as e:
+            metrics.rest_latency.labels("loadtracks", "error").observe(time.perf_counter() - start)
             _log.error(f"[REST] Search error: {e}")
-            return []
+            return None
 
         raw_tracks = []
+        load_type = None
         if self.version == 4:
             if isinstance(data, list):
                 raw_tracks = data
+                load_type = "search"
             else:
                 load_type = data.get("loadType")
                 ddata = data.get("data")
@@ -108,25 +173,13 @@ class RestClient:
                 else:
                     raw_tracks = []
         else:
+            load_type = data.get("loadType")
             raw_tracks = data.get("tracks", [])
 
-        tracks = []
-        for t in raw_tracks:
-            info = t.get("info", t)
-            encoded_str = t.get("encoded", t.get("track"))
-            tracks.append(
-                Track(
-                    encoded=encoded_str,
-                    title=info.get("title", "Unknown"),
-                    author=info.get("author", "Unknown"),
-                    length=info.get("length", 0),
-                    uri=info.get("uri", ""),
-                    identifier=info.get("identifier", "")
-                )
-            )
-        return tracks
+        tracks = [Track.from_payload(t) for t in raw_tracks]
+        return load_type, tracks
 
-    async def update_player(self, guild_id: int, encoded_track: Optional[str] = None, no_replace: bool = False, volume: int = None, paused: bool = None, voice: dict = None, position: int = None):
+    async def update_player(self, guild_id: int, encoded_track: Optional[str] = None, no_replace: bool = False, volume: int = None, paused: bool = None, voice: dict = None, position: int = None, filters: dict = None):
         if not self.session_id: return None
             
         payload = {}
@@ -137,32 +190,46 @@ class RestClient:
         if paused is not None: payload["paused"] = paused
         if voice is not None: payload["voice"] = voice
         if position is not None: payload["position"] = position
+        if filters is not None: payload["filters"] = filters
         
         params = {}
         if no_replace and "track" in payload: params["noReplace"] = "true"
         
 
+        self.last_used = time.monotonic()
         max_attempts = 5 if voice else 3
         timeout_cfg = aiohttp.ClientTimeout(total=10, connect=5, sock_read=8) if voice else aiohttp.ClientTimeout(total=20, connect=10, sock_read=15)
         
+        metrics = self.metrics
+        tracer = self.tracer
         for attempt in range(max_attempts):
+            start = time.perf_counter()
             try:
-                async with self.session.patch(
-                    f"{self.base}/sessions/{self.session_id}/players/{guild_id}",
-                    json=payload,
-                    params=params,
-                    timeout=timeout_cfg
-                ) as resp:
-                    text = await resp.text()
-                    
-                    if voice:
-                        _log.info(f"[REST] Atomic Play succeeded (HTTP {resp.status})")
-                    if resp.status not in (200, 204):
-                        _log.warning(f"[REST] update_player returned {resp.status}, body={text[:200]}")
-                    return resp.status
+                scope = tracer.span("rest.update_player", guild_id=guild_id, attempt=attempt + 1, fields=",".join(payload)) if tracer.enabled else tracer.NOOP
+                with scope as span:
+                    async with self.session.patch(
+                        f"{self.base}/sessions/{self.session_id}/players/{guild_id}",
+                        data=self.codec.dumps_bytes(payload),
+                        params=params,
+                        timeout=timeout_cfg
+                    ) as resp:
+                        text = await resp.text()
+                        metrics.rest_latency.labels("update_player", str(resp.status)).observe(time.perf_counter() - start)
+                        span.set("status", resp.status)
+                        
+                        if voice:
+                            _log.info(f"[REST] Atomic Play succeeded (HTTP {resp.status})")
+                        if resp.status not in (200, 204):
+                            _log.warning(f"[REST] update_player returned {resp.status}, body={text[:200]}")
+                        return resp.status
             except Exception as e:
+                timed_out = isinstance(e, asyncio.TimeoutError)
+                metrics.rest_latency.labels("update_player", "timeout" if timed_out else "error").observe(time.perf_counter() - start)
+                if timed_out:
+                    metrics.rest_timeouts.labels("update_player").inc()
                 retry_delay = 0.1 if voice else 0.2
                 if attempt < max_attempts - 1:
+                    metrics.rest_retries.labels("update_player").inc()
                     _log.debug(f"[REST] Attempt {attempt+1} failed, retrying in {retry_delay}s: {e}")
                     await asyncio.sleep(retry_delay)
                 else:
@@ -171,3 +238,18 @@ class RestClient:
 
     async def update_voice(self, guild_id: int, voice_data: dict):
         return await self.update_player(guild_id, voice=voice_data)
+
+    async def destroy_player(self, guild_id: int):
+        if not self.session_id: return None
+        try:
+            async with self.session.delete(
+                f"{self.base}/sessions/{self.session_id}/players/{guild_id}",
+                timeout=aiohttp.ClientTimeout(total=10, connect=5, sock_read=8)
+            ) as resp:
+                await resp.read()
+                if resp.status not in (200, 204):
+                    _log.warning(f"[REST] destroy_player returned {resp.status}")
+                return resp.status
+        except Exception as e:
+            _log.warning(f"[REST] destroy_player failed: {e}")
+            return None
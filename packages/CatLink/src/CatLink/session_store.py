@@ -0,0 +1,97 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+from typing import Any, Dict
+
+_log = logging.getLogger(__name__)
+
+
+class SessionStore:
+    async def load(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    async def save(self, data: Dict[str, Any]):
+        raise NotImplementedError
+
+
+class FileSessionStore(SessionStore):
+    def __init__(self, path: str):
+        self.path = path
+
+    def _read(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            _log.warning(f"[Store] Ignoring unreadable session file {self.path}: {e}")
+            return {}
+
+    def _write(self, data: Dict[str, Any]):
+        # 先寫到暫存檔再 rename，程式中途被砍也不會留下寫一半的檔案
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(prefix=".catlink-", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+    async def load(self) -> Dict[str, Any]:
+        return await asyncio.to_thread(self._read)
+
+    async def save(self, data: Dict[str, Any]):
+        await asyncio.to_thread(self._write, data)
+
+
+class SQLiteSessionStore(SessionStore):
+    def __init__(self, path: str, key: str = "default"):
+        self.path = path
+        self.key = key
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE IF NOT EXISTS catlink_state (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        return conn
+
+    def _read(self) -> Dict[str, Any]:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT value FROM catlink_state WHERE key = ?", (self.key,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return {}
+        try:
+            return json.loads(row[0])
+        except ValueError as e:
+            _log.warning(f"[Store] Ignoring unreadable session row {self.key}: {e}")
+            return {}
+
+    def _write(self, data: Dict[str, Any]):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO catlink_state (key, value) VALUES (?, ?)",
+                    (self.key, json.dumps(data, separators=(",", ":"))),
+                )
+        finally:
+            conn.close()
+
+    async def load(self) -> Dict[str, Any]:
+        return await asyncio.to_thread(self._read)
+
+    async def save(self, data: Dict[str, Any]):
+        await asyncio.to_thread(self._write, data)
@@ -0,0 +1,93 @@
+import asyncio
+import logging
+import math
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+_log = logging.getLogger(__name__)
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel：所有計時共用一個背景 task，每個 tick 只處理一格，
+    重新排程同一個 key 會覆蓋舊的計時，不必為每個 guild 各開一個 task。
+    """
+
+    def __init__(self, tick: float = 1.0, slots: int = 512):
+        self.tick = tick
+        self._slots: List[Dict[Hashable, Tuple[int, Callable[[Hashable], None]]]] = [{} for _ in range(slots)]
+        self._where: Dict[Hashable, int] = {}
+        self._cursor = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._where
+
+    def schedule(self, key: Hashable, delay: float, callback: Callable[[Hashable], None]):
+        self.cancel(key)
+        n = len(self._slots)
+        ticks = max(1, math.ceil(delay / self.tick))
+        slot = (self._cursor + ticks) % n
+        self._slots[slot][key] = ((ticks - 1) // n, callback)
+        self._where[key] = slot
+        self._ensure_running()
+
+    def cancel(self, key: Hashable) -> bool:
+        slot = self._where.pop(key, None)
+        if slot is None:
+            return False
+        self._slots[slot].pop(key, None)
+        return True
+
+    def _ensure_running(self):
+        if self._task is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        try:
+            while self._where:
+                deadline += self.tick
+                await asyncio.sleep(max(0.0, deadline - loop.time()))
+                # 事件迴圈卡住時補走落後的格數，計時不會因此延後
+                while deadline <= loop.time() - self.tick:
+                    self._advance()
+                    deadline += self.tick
+                self._advance()
+        finally:
+            self._task = None
+
+    def _advance(self):
+        self._cursor = (self._cursor + 1) % len(self._slots)
+        slot = self._slots[self._cursor]
+        if not slot:
+            return
+        due = []
+        for key, (rounds, callback) in list(slot.items()):
+            if rounds:
+                slot[key] = (rounds - 1, callback)
+            else:
+                del slot[key]
+                del self._where[key]
+                due.append((key, callback))
+        for key, callback in due:
+            try:
+                callback(key)
+            except Exception as e:
+                _log.error(f"[Timer] Callback for {key!r} failed: {e}")
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for slot in self._slots:
+            slot.clear()
+        self._where.clear()
@@ -0,0 +1,269 @@
+import logging
+import secrets
+import time
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Iterable, List, Optional
+import aiohttp
+
+_log = logging.getLogger(__name__)
+
+# perf_counter 換算成 epoch，給需要絕對時間的 sink (OpenTelemetry) 使用
+_EPOCH_OFFSET = time.time() - time.perf_counter()
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "guild_id", "start", "end", "attributes", "status")
+
+    def __init__(self, name: str, trace_id: str, span_id: str, parent_id: Optional[str], guild_id: Optional[int], attributes: Dict[str, Any], start: Optional[float] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.guild_id = guild_id
+        self.start = time.perf_counter() if start is None else start
+        self.end: Optional[float] = None
+        self.attributes = attributes
+        self.status = "ok"
+
+    def set(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def epoch_ns(self, t: float) -> int:
+        return int((t + _EPOCH_OFFSET) * 1e9)
+
+    def __repr__(self) -> str:
+        return f"<Span {self.name} {self.duration_ms:.1f}ms trace={self.trace_id} guild={self.guild_id}>"
+
+
+class _NoopSpan:
+    __slots__ = ()
+    guild_id = None
+
+    def set(self, key: str, value: Any):
+        pass
+
+
+class _NoopScope:
+    __slots__ = ()
+
+    def __enter__(self):
+        return _NOOP_SPAN
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+_NOOP_SCOPE = _NoopScope()
+_current: ContextVar[Optional[Span]] = ContextVar("catlink_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+class _SpanScope:
+    __slots__ = ("tracer", "span", "token")
+
+    def __init__(self, tracer: "Tracer", span: Span):
+        self.tracer = tracer
+        self.span = span
+        self.token = None
+
+    def __enter__(self) -> Span:
+        self.token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self.token)
+        if exc_type is not None:
+            self.span.status = "error"
+            self.span.attributes["error"] = exc_type.__name__
+        self.tracer.finish(self.span)
+        return False
+
+
+class SpanSink:
+    def export(self, span: Span):
+        raise NotImplementedError
+
+
+class LogSink(SpanSink):
+    def __init__(self, level: int = logging.INFO):
+        self.level = level
+
+    def export(self, span: Span):
+        attrs = " ".join(f"{k}={v}" for k, v in span.attributes.items())
+        _log.log(self.level, f"[Trace] {span.name} {span.duration_ms:.1f}ms guild={span.guild_id} trace={span.trace_id} status={span.status} {attrs}".rstrip())
+
+
+class RingBufferSink(SpanSink):
+    def __init__(self, maxlen: int = 2048):
+        self.spans: Deque[Span] = deque(maxlen=maxlen)
+
+    def export(self, span: Span):
+        self.spans.append(span)
+
+    def trace(self, trace_id: str) -> List[Span]:
+        return sorted((s for s in self.spans if s.trace_id == trace_id), key=lambda s: s.start)
+
+    def for_guild(self, guild_id: int) -> List[Span]:
+        return [s for s in self.spans if s.guild_id == guild_id]
+
+
+class OpenTelemetrySink(SpanSink):
+    """
+    轉送到 OpenTelemetry (需另外安裝 opentelemetry-api/sdk)。
+    子 span 會比父 span 先結束，所以先暫存，等父 span 送出後再掛上去。
+    """
+
+    def __init__(self, tracer_name: str = "catlink", max_pending: int = 4096):
+        from opentelemetry import trace
+        self._trace = trace
+        self._tracer = trace.get_tracer(tracer_name)
+        self._emitted: "OrderedDict[str, Any]" = OrderedDict()
+        self._waiting: "OrderedDict[str, List[Span]]" = OrderedDict()
+        self.max_pending = max_pending
+
+    def export(self, span: Span):
+        if span.parent_id is None:
+            self._emit(span, None)
+            return
+        parent = self._emitted.get(span.parent_id)
+        if parent is not None:
+            self._emit(span, parent)
+            return
+        self._waiting.setdefault(span.parent_id, []).append(span)
+        while len(self._waiting) > self.max_pending:
+            self._waiting.popitem(last=False)
+
+    def _emit(self, span: Span, parent: Any):
+        context = self._trace.set_span_in_context(parent) if parent is not None else None
+        attributes = {k: v for k, v in span.attributes.items() if isinstance(v, (str, bool, int, float))}
+        attributes["catlink.trace_id"] = span.trace_id
+        if span.guild_id is not None:
+            attributes["discord.guild_id"] = span.guild_id
+        otel_span = self._tracer.start_span(span.name, context=context, attributes=attributes, start_time=span.epoch_ns(span.start))
+        if span.status == "error":
+            otel_span.set_status(self._trace.Status(self._trace.StatusCode.ERROR))
+        otel_span.end(end_time=span.epoch_ns(span.end if span.end is not None else span.start))
+        self._emitted[span.span_id] = otel_span
+        while len(self._emitted) > self.max_pending:
+            self._emitted.popitem(last=False)
+        for child in self._waiting.pop(span.span_id, ()):
+            self._emit(child, otel_span)
+
+
+class Tracer:
+    # 熱路徑上先檢查 enabled，關閉時直接用這個空 scope，連屬性 dict 都不必建立
+    NOOP = _NOOP_SCOPE
+
+    def __init__(self, sinks: Optional[Iterable[SpanSink]] = None):
+        self.sinks: List[SpanSink] = list(sinks or ())
+        self._pending: Dict[Any, Span] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.sinks)
+
+    def add_sink(self, sink: SpanSink):
+        self.sinks.append(sink)
+
+    def _new_span(self, name: str, guild_id: Optional[int], request_id: Optional[str], attributes: Dict[str, Any], start: Optional[float] = None, parent: Optional[Span] = None) -> Span:
+        parent = parent if parent is not None else _current.get()
+        if parent is not None:
+            return Span(name, parent.trace_id, secrets.token_hex(8), parent.span_id, guild_id if guild_id is not None else parent.guild_id, attributes, start)
+        return Span(name, request_id or secrets.token_hex(16), secrets.token_hex(8), None, guild_id, attributes, start)
+
+    def span(self, name: str, guild_id: Optional[int] = None, request_id: Optional[str] = None, **attributes):
+        # 沒有 sink 時回傳共用的空 scope，熱路徑上不會產生任何物件
+        if not self.sinks:
+            return _NOOP_SCOPE
+        return _SpanScope(self, self._new_span(name, guild_id, request_id, attributes))
+
+    def record(self, name: str, start: float, end: float, parent: Optional[Span] = None, status: str = "ok", **attributes) -> Optional[Span]:
+        if not self.sinks:
+            return None
+        span = self._new_span(name, None, None, attributes, start=start, parent=parent)
+        span.end = end
+        span.status = status
+        self._export(span)
+        return span
+
+    def finish(self, span: Span):
+        span.end = time.perf_counter()
+        self._export(span)
+
+    def _export(self, span: Span):
+        for sink in self.sinks:
+            try:
+                sink.export(span)
+            except Exception as e:
+                _log.warning(f"[Trace] Sink {type(sink).__name__} failed: {e}")
+
+    # 跨 task 的階段：例如送出播放請求到收到 TrackStartEvent
+
+    def expect(self, key: Any, span: Any):
+        if isinstance(span, Span):
+            self._pending[key] = span
+
+    def fulfil(self, key: Any, name: str, **attributes) -> Optional[Span]:
+        span = self._pending.pop(key, None)
+        if span is None:
+            return None
+        return self.record(name, span.start, time.perf_counter(), parent=span, **attributes)
+
+    def discard(self, key: Any):
+        self._pending.pop(key, None)
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, ctx, params):
+            ctx.start = time.perf_counter()
+            ctx.reused = False
+
+        async def on_dns_start(session, ctx, params):
+            ctx.dns_start = time.perf_counter()
+
+        async def on_dns_end(session, ctx, params):
+            self.record("http.dns", ctx.dns_start, time.perf_counter(), host=params.host)
+
+        async def on_connect_start(session, ctx, params):
+            ctx.connect_start = time.perf_counter()
+
+        async def on_connect_end(session, ctx, params):
+            self.record("http.connect", ctx.connect_start, time.perf_counter())
+
+        async def on_queued_start(session, ctx, params):
+            ctx.queued_start = time.perf_counter()
+
+        async def on_queued_end(session, ctx, params):
+            self.record("http.pool_wait", ctx.queued_start, time.perf_counter())
+
+        async def on_reuse(session, ctx, params):
+            ctx.reused = True
+
+        async def on_request_end(session, ctx, params):
+            self.record(f"http.{params.method.lower()}", ctx.start, time.perf_counter(), path=params.url.path, http_status=params.response.status, reused=ctx.reused)
+
+        async def on_request_exception(session, ctx, params):
+            self.record(f"http.{params.method.lower()}", ctx.start, time.perf_counter(), status="error", path=params.url.path, error=type(params.exception).__name__)
+
+        config.on_request_start.append(on_request_start)
+        config.on_dns_resolvehost_start.append(on_dns_start)
+        config.on_dns_resolvehost_end.append(on_dns_end)
+        config.on_connection_create_start.append(on_connect_start)
+        config.on_connection_create_end.append(on_connect_end)
+        config.on_connection_queued_start.append(on_queued_start)
+        config.on_connection_queued_end.append(on_queued_end)
+        config.on_connection_reuseconn.append(on_reuse)
+        config.on_request_end.append(on_request_end)
+        config.on_request_exception.append(on_request_exception)
+        return config
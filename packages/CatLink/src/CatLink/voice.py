@@ -1,8 +1,95 @@
+import asyncio
+
+
 class VoiceState:
     def __init__(self):
-        self.session_id: str | None = None
-        self.token: str | None = None
-        self.endpoint: str | None = None
+        self._session_id: str | None = None
+        self._token: str | None = None
+        self._endpoint: str | None = None
+        self._ready_event: asyncio.Event | None = None
+        # 憑證每變動一次 version 就加一，synced_version 是節點已經收到的版本
+        self.version = 0
+        self.synced_version = 0
+
+    @property
+    def session_id(self) -> str | None:
+        return self._session_id
+
+    @session_id.setter
+    def session_id(self, value: str | None):
+        if value == self._session_id:
+            return
+        self._session_id = value
+        self._changed()
+
+    @property
+    def token(self) -> str | None:
+        return self._token
+
+    @token.setter
+    def token(self, value: str | None):
+        if value == self._token:
+            return
+        self._token = value
+        self._changed()
+
+    @property
+    def endpoint(self) -> str | None:
+        return self._endpoint
+
+    @endpoint.setter
+    def endpoint(self, value: str | None):
+        if value == self._endpoint:
+            return
+        self._endpoint = value
+        self._changed()
 
     def ready(self) -> bool:
-        return all([self.session_id, self.token, self.endpoint])
+        return all([self._session_id, self._token, self._endpoint])
+
+    def credentials(self) -> tuple:
+        return (self._session_id, self._token, self._endpoint)
+
+    def payload(self) -> dict:
+        return {"sessionId": self._session_id, "token": self._token, "endpoint": self._endpoint}
+
+    def needs_sync(self) -> bool:
+        return self.ready() and self.synced_version != self.version
+
+    def begin_sync(self) -> int | None:
+        # 送出前先標記，同時進行的其他請求就不會再帶一次同一組憑證
+        if not self.needs_sync():
+            return None
+        self.synced_version = self.version
+        return self.version
+
+    def sync_failed(self, version: int):
+        if self.synced_version == version:
+            self.synced_version = -1
+
+    def invalidate(self):
+        # 換節點或 session 沒接回時，節點那邊已經沒有這組憑證
+        self.synced_version = -1
+
+    def _changed(self):
+        self.version += 1
+        self._update_ready()
+
+    def _update_ready(self):
+        if self._ready_event is None:
+            return
+        if self.ready():
+            self._ready_event.set()
+        else:
+            self._ready_event.clear()
+
+    async def wait_ready(self, timeout: float = 4.0) -> bool:
+        if self.ready():
+            return True
+        if self._ready_event is None:
+            self._ready_event = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._ready_event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.ready()
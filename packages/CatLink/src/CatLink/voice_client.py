@@ -4,6 +4,7 @@ from typing import Optional, TYPE_CHECKING
 
 import discord
 from discord import VoiceProtocol
+from .tracing import Tracer
 
 if TYPE_CHECKING:
     from .client import LavalinkClient
@@ -46,9 +47,8 @@ class LavalinkVoiceClient(VoiceProtocol):
 
         lavalink = self._get_lavalink()
         if lavalink and self._token and self._endpoint:
-            voice = lavalink.node.get_voice(self._guild.id)
-            voice.token = self._token
-            voice.endpoint = self._endpoint
+            # 與 gateway payload 寫入的是同一組憑證時不會重複同步
+            lavalink.update_voice_credentials(self._guild.id, token=self._token, endpoint=self._endpoint)
             _log.info(f"[LavalinkVC] Updated token/endpoint to Node")
         
         self._connected.set()
@@ -66,24 +66,26 @@ class LavalinkVoiceClient(VoiceProtocol):
             _log.info(f"[LavalinkVC] VOICE_STATE_UPDATE: channel={channel_id}, session={session_id}")
             lavalink = self._get_lavalink()
             if lavalink and session_id:
-                voice = lavalink.node.get_voice(self._guild.id)
-                voice.session_id = session_id
+                lavalink.update_voice_credentials(self._guild.id, session_id=session_id)
                 _log.info(f"[LavalinkVC] Updated session_id to Node")
 
     async def connect(self, *, timeout: float = 30.0, reconnect: bool = True, self_deaf: bool = False, self_mute: bool = False) -> None:
         _log.info(f"[LavalinkVC] Joining voice channel {self.channel.id}...")
-        await self._guild.change_voice_state(
-            channel=self.channel,
-            self_mute=self_mute,
-            self_deaf=self_deaf
-        )
-        
-        try:
-            await asyncio.wait_for(self._connected.wait(), timeout=timeout)
-            _log.info(f"[LavalinkVC] Joined voice channel {self.channel.id}")
-        except asyncio.TimeoutError:
-            _log.warning(f"[LavalinkVC] Join voice channel timeout")
-            raise discord.errors.ConnectionClosed(None, None, 4006)
+        lavalink = self._get_lavalink()
+        tracer = lavalink.tracer if lavalink else Tracer()
+        with tracer.span("voice.connect", guild_id=self._guild.id, channel=self.channel.id):
+            await self._guild.change_voice_state(
+                channel=self.channel,
+                self_mute=self_mute,
+                self_deaf=self_deaf
+            )
+            
+            try:
+                await asyncio.wait_for(self._connected.wait(), timeout=timeout)
+                _log.info(f"[LavalinkVC] Joined voice channel {self.channel.id}")
+            except asyncio.TimeoutError:
+                _log.warning(f"[LavalinkVC] Join voice channel timeout")
+                raise discord.errors.ConnectionClosed(None, None, 4006)
 
     async def disconnect(self, *, force: bool = False) -> None:
         _log.info(f"[LavalinkVC] Leaving voice channel...")
@@ -1,8 +1,12 @@
 import asyncio
-import json
+import enum
 import logging
+import random
 import sys
 import aiohttp
+from collections import deque
+from typing import Awaitable, Callable, Deque, Optional
+from .codec import JSONCodec, get_codec
 
 _log = logging.getLogger(__name__)
 
@@ -14,6 +18,14 @@ WS_TIMEOUT = aiohttp.ClientTimeout(
     sock_read=None
 )
 
+class ConnectionState(enum.Enum):
+    DISCONNECTED = "disconnected"
+    CONNECTING = "connecting"
+    CONNECTED = "connected"
+    RECONNECTING = "reconnecting"
+    CLOSED = "closed"
+
+
 class LavalinkWebSocket:
     def __init__(
         self,
@@ -24,7 +36,12 @@ class LavalinkWebSocket:
         session_id: str,
         handler,
         secure: bool = False,
-        version: int = 4
+        version: int = 4,
+        codec: JSONCodec = None,
+        on_state_change: Optional[Callable[[ConnectionState, ConnectionState], Awaitable[None]]] = None,
+        backoff_base: float = 1.0,
+        backoff_cap: float = 60.0,
+        max_queued: int = 1000
     ):
         protocol = "wss" if secure else "ws"
         if version == 4:
@@ -32,20 +49,51 @@ class LavalinkWebSocket:
         else:
             self.uri = f"{protocol}://{host}:{port}/v3/websocket"
 
+        self.version = version
         self.headers = {
             "Authorization": password,
             "User-Id": str(user_id),
             "Client-Name": "lavalink_simple",
         }
-        
-        if version == 4 and session_id:
-            self.headers["Session-Id"] = session_id
+        self.session_id = session_id
             
         self.handler = handler
+        self.codec = codec or get_codec()
+        self.on_state_change = on_state_change
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.state = ConnectionState.DISCONNECTED
+        self.attempts = 0
+        self._outbox: Deque[dict] = deque(maxlen=max_queued)
         self._running = True
+        # close() 時叫醒重連前的等待
+        self._stopped = asyncio.Event()
         self.ws = None
         self.session = None
 
+    async def _set_state(self, state: ConnectionState):
+        previous = self.state
+        if previous is state:
+            return
+        self.state = state
+        _log.info(f"[Lavalink WS] {previous.value} -> {state.value}")
+        if self.on_state_change is not None:
+            try:
+                await self.on_state_change(state, previous)
+            except Exception as e:
+                _log.error(f"[Lavalink WS] State listener failed: {e}")
+
+    def _next_delay(self, previous: float) -> float:
+        # decorrelated jitter：各個 bot process 的重連時間會自然錯開
+        return min(self.backoff_cap, random.uniform(self.backoff_base, previous * 3))
+
+    def _connect_headers(self) -> dict:
+        headers = dict(self.headers)
+        # v4 帶上舊的 Session-Id，Lavalink 才會接回原本的 session 與 player
+        if self.version == 4 and self.session_id:
+            headers["Session-Id"] = self.session_id
+        return headers
+
     async def connect(self):
         import socket
         family = socket.AF_INET if sys.platform == 'win32' else socket.AF_UNSPEC
@@ -56,42 +104,86 @@ class LavalinkWebSocket:
             enable_cleanup_closed=True
         )
         self.session = aiohttp.ClientSession(connector=conn, timeout=WS_TIMEOUT)
+        delay = self.backoff_base
         
-        while self._running:
+        try:
+            while self._running:
+                await self._set_state(ConnectionState.CONNECTING if self.attempts == 0 else ConnectionState.RECONNECTING)
+                self.attempts += 1
+                try:
+                    _log.info(f"Connecting to WS: {self.uri} (attempt {self.attempts})")
+                    async with self.session.ws_connect(
+                        self.uri, 
+                        headers=self._connect_headers(), 
+                        heartbeat=15.0, 
+                        timeout=15.0, 
+                        receive_timeout=None 
+                    ) as ws:
+                        self.ws = ws
+                        _log.info("WebSocket connected!")
+                        delay = self.backoff_base
+                        await self._set_state(ConnectionState.CONNECTED)
+                        # v3 要等 ready 確認是否接回 session，才決定重送還是丟掉
+                        if self.version == 4:
+                            await self.flush_outbox()
+                        
+                        loads = self.codec.loads
+                        async for msg in ws:
+                            if msg.type in (aiohttp.WSMsgType.TEXT, aiohttp.WSMsgType.BINARY):
+                                try:
+                                    await self.handler(loads(msg.data))
+                                except Exception as e:
+                                    _log.error(f"Error handling WS message: {e}")
+                            elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                                _log.warning(f"WebSocket closed: {msg}")
+                                break
+                        if self._running:
+                            _log.warning(f"[Lavalink WS] Connection closed (code={ws.close_code})")
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    _log.error(f"[Lavalink WS] Connection failed: {e}")
+                finally:
+                    self.ws = None
+
+                if not self._running:
+                    break
+                await self._set_state(ConnectionState.DISCONNECTED)
+                delay = self._next_delay(delay)
+                _log.info(f"[Lavalink WS] reconnecting in {delay:.2f}s")
+                try:
+                    await asyncio.wait_for(self._stopped.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            await self._set_state(ConnectionState.CLOSED)
+            if self.session:
+                await self.session.close()
+                self.session = None
+
+    async def flush_outbox(self):
+        while self._outbox and self.ws is not None and not self.ws.closed:
+            payload = self._outbox.popleft()
             try:
-                _log.info(f"Connecting to WS: {self.uri}")
-                async with self.session.ws_connect(
-                    self.uri, 
-                    headers=self.headers, 
-                    heartbeat=15.0, 
-                    timeout=15.0, 
-                    receive_timeout=None 
-                ) as ws:
-                    self.ws = ws
-                    _log.info("WebSocket connected!")
-                    
-                    async for msg in ws:
-                        if msg.type == aiohttp.WSMsgType.TEXT:
-                            try:
-                                await self.handler(json.loads(msg.data))
-                            except Exception as e:
-                                _log.error(f"Error handling WS message: {e}")
-                        elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
-                            _log.warning(f"WebSocket closed: {msg}")
-                            break
-                            
+                await self.ws.send_str(self.codec.dumps(payload))
             except Exception as e:
-                _log.error(f"[Lavalink WS] reconnecting in 5s: {e}")
-                await asyncio.sleep(5)
-        
-        if self.session:
-            await self.session.close()
+                self._outbox.appendleft(payload)
+                _log.warning(f"[Lavalink WS] Failed to flush queued payload: {e}")
+                return
 
     async def send(self, payload: dict):
         if self.ws and not self.ws.closed:
-            await self.ws.send_json(payload)
+            await self.ws.send_str(self.codec.dumps(payload))
         else:
-            _log.warning("WebSocket is not connected, dropping payload")
+            if len(self._outbox) == self._outbox.maxlen:
+                _log.warning("WebSocket send queue is full, dropping oldest payload")
+            self._outbox.append(payload)
+
+    def clear_outbox(self) -> int:
+        dropped = len(self._outbox)
+        self._outbox.clear()
+        return dropped
 
     def close(self):
         self._running = False
+        self._stopped.set()
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+_log = logging.getLogger(__name__)
+
+
+class PlayerUpdateWriter:
+    def __init__(self, rest, delay: float = 0.0, gate: Optional[Callable[[int], Awaitable[bool]]] = None):
+        self.rest = rest
+        self.delay = delay
+        # 送出前等待節點可用 (例如 session 重連中)；等待期間的變更會繼續合併
+        self.gate = gate
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        self._waiters: Dict[int, List[asyncio.Future]] = {}
+        self._active: Dict[int, asyncio.Task] = {}
+        self._inflight: Dict[int, Dict[str, Any]] = {}
+        self.submitted = 0
+        self.sent = 0
+
+    def submit(self, guild_id: int, **fields) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.setdefault(guild_id, {}).update(fields)
+        self._waiters.setdefault(guild_id, []).append(fut)
+        self.submitted += 1
+        if guild_id not in self._active:
+            self._active[guild_id] = loop.create_task(self._run(guild_id))
+        return fut
+
+    def discard(self, guild_id: int, *fields: str):
+        pending = self._pending.get(guild_id)
+        if not pending:
+            return
+        for name in fields:
+            pending.pop(name, None)
+        if not pending:
+            del self._pending[guild_id]
+            for fut in self._waiters.pop(guild_id, []):
+                if not fut.done():
+                    fut.set_result(None)
+
+    def outstanding(self, guild_id: int) -> Dict[str, Any]:
+        # 送出中與還在排隊的變更，後者較新
+        return {**self._inflight.get(guild_id, {}), **self._pending.get(guild_id, {})}
+
+    def transfer(self, guild_id: int, other: "PlayerUpdateWriter"):
+        # player 換節點時，還沒送出的變更 (連同等待中的呼叫) 改由新節點送出
+        fields = self._pending.pop(guild_id, None)
+        waiters = self._waiters.pop(guild_id, [])
+        if not fields:
+            for fut in waiters:
+                if not fut.done():
+                    fut.set_result(None)
+            return
+        other._pending.setdefault(guild_id, {}).update(fields)
+        other._waiters.setdefault(guild_id, []).extend(waiters)
+        if guild_id not in other._active:
+            other._active[guild_id] = asyncio.get_running_loop().create_task(other._run(guild_id))
+
+    async def _run(self, guild_id: int):
+        # 每個 guild 同時只有一個 PATCH 在路上，期間累積的變更會合併成下一個 PATCH
+        try:
+            while guild_id in self._pending:
+                await asyncio.sleep(self.delay)
+                if self.gate is not None and not await self.gate(guild_id):
+                    # 節點關閉、等待逾時或 player 已搬走，剩下的變更不會再送出
+                    self.discard(guild_id, *list(self._pending.get(guild_id, ())))
+                    continue
+                fields = self._pending.pop(guild_id, None)
+                waiters = self._waiters.pop(guild_id, [])
+                if not fields:
+                    continue
+                self._inflight[guild_id] = fields
+                try:
+                    status = await self.rest.update_player(guild_id, **fields)
+                except Exception as e:
+                    _log.warning(f"[Writer] Merged update failed (guild={guild_id}): {e}")
+                    status = None
+                finally:
+                    self._inflight.pop(guild_id, None)
+                self.sent += 1
+                for fut in waiters:
+                    if not fut.done():
+                        fut.set_result(status)
+        finally:
+            self._active.pop(guild_id, None)
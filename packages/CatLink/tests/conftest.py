@@ -0,0 +1,8 @@
+import os
+import sys
+
+# 測試直接使用 src 與 benchmarks 裡的假節點，不需要先安裝套件
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (os.path.join(ROOT, "src"), os.path.join(ROOT, "benchmarks")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
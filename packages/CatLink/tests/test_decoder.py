@@ -0,0 +1,115 @@
+import base64
+import struct
+
+import pytest
+
+from CatLink.decoder import decode_track, decode_tracks
+from CatLink.errors import TrackDecodeError
+
+from fake_lavalink import encode_track
+
+
+# Lavalink v3 文件裡的範例 (track message v2)
+RICK_V2 = (
+    "QAAAjQIAJVJpY2sgQXN0bGV5IC0gTmV2ZXIgR29ubmEgR2l2ZSBZb3UgVXAADlJpY2tBc3RsZXlWRVZPAAAAAAADPCAAC2RRdzR3OVdnWGNR"
+    "AAEAK2h0dHBzOi8vd3d3LnlvdXR1YmUuY29tL3dhdGNoP3Y9ZFF3NHc5V2dYY1EAB3lvdXR1YmUAAAAAAAAAAA=="
+)
+
+
+def _utf(value: str) -> bytes:
+    data = value.encode("utf-8")
+    return struct.pack(">H", len(data)) + data
+
+
+def _nullable(value) -> bytes:
+    return b"\x00" if value is None else b"\x01" + _utf(value)
+
+
+def _message(body: bytes, versioned: bool = True) -> str:
+    header = ((1 << 30) if versioned else 0) | len(body)
+    return base64.b64encode(struct.pack(">i", header) + body).decode("ascii")
+
+
+def _common(title="Song", author="Artist", length=123_456, identifier="abc123", stream=False) -> bytes:
+    return _utf(title) + _utf(author) + struct.pack(">q", length) + _utf(identifier) + (b"\x01" if stream else b"\x00")
+
+
+def test_v2_blob_from_lavalink():
+    track = decode_track(RICK_V2)
+    assert track.encoded == RICK_V2
+    assert track.title == "Rick Astley - Never Gonna Give You Up"
+    assert track.author == "RickAstleyVEVO"
+    assert track.length == 212_000
+    assert track.identifier == "dQw4w9WgXcQ"
+    assert track.uri == "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+    assert track.source_name == "youtube"
+    assert not track.is_stream and track.is_seekable
+    assert track.artwork_url is None and track.isrc is None
+
+
+def test_v1_message_without_version_flag():
+    # v1 沒有版本位元組，也沒有 uri
+    blob = _message(_common(stream=True) + _utf("http") + struct.pack(">q", 0), versioned=False)
+    track = decode_track(blob)
+    assert (track.title, track.author, track.length, track.identifier) == ("Song", "Artist", 123_456, "abc123")
+    assert track.is_stream and not track.is_seekable
+    assert track.uri == ""
+    assert track.source_name == "http"
+
+
+def test_v3_message_with_artwork_and_isrc():
+    body = (
+        b"\x03"
+        + _common(title="Nul\x00 and 🎵")
+        + _nullable("https://example.com/abc123")
+        + _nullable("https://img.example.com/abc123.jpg")
+        + _nullable("USUM71703861")
+        + _utf("spotify")
+        + struct.pack(">q", 0)
+    )
+    track = decode_track(_message(body))
+    assert track.title == "Nul\x00 and 🎵"
+    assert track.uri == "https://example.com/abc123"
+    assert track.artwork_url == "https://img.example.com/abc123.jpg"
+    assert track.isrc == "USUM71703861"
+    assert track.source_name == "spotify"
+
+
+def test_modified_utf8_strings():
+    # Java 的 writeUTF：NUL 寫成 C0 80，emoji 寫成兩個 3 byte 的 surrogate
+    title = b"a\xc0\x80b" + b"\xed\xa0\xbc\xed\xbe\xb5"
+    body = (
+        b"\x02"
+        + struct.pack(">H", len(title)) + title
+        + _utf("Artist") + struct.pack(">q", 1) + _utf("id") + b"\x00"
+        + _nullable(None)
+        + _utf("youtube")
+    )
+    assert decode_track(_message(body)).title == "a\x00b🎵"
+
+
+def test_fake_node_encoder_round_trip():
+    blob = encode_track("Title", "Author", 42_000, "xyz", uri="https://example.com/xyz", source="soundcloud")
+    track = decode_track(blob)
+    assert (track.title, track.author, track.length, track.identifier) == ("Title", "Author", 42_000, "xyz")
+    assert track.uri == "https://example.com/xyz"
+    assert track.source_name == "soundcloud"
+
+
+@pytest.mark.parametrize("blob", [
+    "not base64!!",
+    RICK_V2[:40],
+    base64.b64encode(base64.b64decode(RICK_V2)[:60]).decode("ascii"),
+    _message(b"\x04" + _common() + _utf("youtube")),
+    _message(b"\x02" + struct.pack(">H", 500) + b"short"),
+    "",
+])
+def test_malformed_blobs_raise(blob):
+    with pytest.raises(TrackDecodeError):
+        decode_track(blob)
+
+
+def test_decode_tracks_skip_invalid():
+    assert [t.identifier for t in decode_tracks([RICK_V2, "garbage"], skip_invalid=True)] == ["dQw4w9WgXcQ"]
+    with pytest.raises(TrackDecodeError):
+        decode_tracks([RICK_V2, "garbage"])
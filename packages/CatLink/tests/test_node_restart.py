@@ -0,0 +1,309 @@
+import asyncio
+
+from CatLink import LavalinkClient
+
+from fake_lavalink import FakeConfig, FakeLavalink
+
+
+class _User:
+    id = 1
+
+
+class StubBot:
+    def __init__(self):
+        self.user = _User()
+        self.loop = asyncio.get_running_loop()
+
+    def add_listener(self, func, name: str):
+        pass
+
+
+async def _wait_for(predicate, timeout: float = 10.0) -> bool:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while loop.time() < deadline:
+        if predicate():
+            return True
+        await asyncio.sleep(0.05)
+    return predicate()
+
+
+async def _restart_scenario():
+    fake = FakeLavalink(FakeConfig(update_interval=3600, stats_interval=3600))
+    await fake.start()
+    client = LavalinkClient(StubBot(), "127.0.0.1", fake.port, "youshallnotpass", user_id=1, idle_timeout=None, prefetch_count=0)
+    node = client.node
+    restarted = None
+    try:
+        await client.connect()
+        node.ws.backoff_base = 0.05
+        node.ws.backoff_cap = 0.2
+        assert await node.wait_ready(timeout=5.0)
+
+        guild_id = 4242
+        voice = client.get_voice(guild_id)
+        voice.session_id, voice.token, voice.endpoint = "sess", "token", "fake.discord.media"
+        track = (await client.search_tracks("restart"))[0]
+        player = client.get_player(guild_id)
+        await player.set_volume(55)
+        await player.play(track)
+        assert fake.players[str(guild_id)].track is not None
+
+        # 節點整個重啟：同一個 port，但 session 是新的，舊的 player 都不見了
+        await fake.close()
+        restarted = FakeLavalink(FakeConfig(update_interval=3600, stats_interval=3600), port=fake.port)
+        restarted.session_id = "fresh-session"
+        await restarted.start()
+
+        assert await _wait_for(lambda: str(guild_id) in restarted.players and restarted.players[str(guild_id)].track is not None)
+        state = restarted.players[str(guild_id)]
+        assert state.track["encoded"] == track.encoded
+        assert state.volume == 55
+        assert state.voice == {"sessionId": "sess", "token": "token", "endpoint": "fake.discord.media"}
+        assert node.session_id == "fresh-session"
+    finally:
+        await client.close()
+        if restarted is not None:
+            await restarted.close()
+
+
+def test_live_player_is_resent_after_node_restart():
+    asyncio.run(_restart_scenario())
+
+
+async def _single_node_outage():
+    fake = FakeLavalink(FakeConfig(update_interval=3600, stats_interval=3600))
+    await fake.start()
+    client = LavalinkClient(StubBot(), "127.0.0.1", fake.port, "youshallnotpass", user_id=1, idle_timeout=None, prefetch_count=0, failover_delay=0.1)
+    node = client.node
+    await client.connect()
+    assert await node.wait_ready(timeout=5.0)
+    client.get_player(7)
+    loop = asyncio.get_running_loop()
+    errors = []
+    loop.set_exception_handler(lambda loop, context: errors.append(context))
+
+    await fake.close()
+    assert await _wait_for(lambda: node.name in client._failovers)
+    # 沒有其他節點可搬，failover 應該安靜結束而不是丟出例外
+    assert await _wait_for(lambda: node.name not in client._failovers)
+    assert await client.migrate(7) is False
+
+    # 關閉時還在等待的 failover 也要一併取消
+    client.failover_delay = 30.0
+    await client._on_node_state(type("Event", (), {"state": "disconnected", "node": node.name})())
+    task = client._failovers[node.name]
+    await client.close()
+    assert task.done()
+    assert not errors
+
+
+def test_single_node_outage_does_not_raise():
+    asyncio.run(_single_node_outage())
+
+
+async def _updates_during_reconnect():
+    fake = FakeLavalink(FakeConfig(update_interval=3600, stats_interval=3600))
+    await fake.start()
+    client = LavalinkClient(StubBot(), "127.0.0.1", fake.port, "youshallnotpass", user_id=1, idle_timeout=None, prefetch_count=0, failover_delay=None)
+    node = client.node
+    try:
+        await client.connect()
+        node.ws.backoff_base = 0.3
+        node.ws.backoff_cap = 0.3
+        assert await node.wait_ready(timeout=5.0)
+        guild_id = 99
+        voice = client.get_voice(guild_id)
+        voice.session_id, voice.token, voice.endpoint = "sess", "token", "fake.discord.media"
+        player = client.get_player(guild_id)
+        await player.play((await client.search_tracks("drop"))[0])
+
+        # 只斷 WebSocket，節點與 session 都還在
+        for ws in list(fake.sockets):
+            await ws.close()
+        assert await _wait_for(lambda: not node.available)
+        volume = asyncio.ensure_future(player.set_volume(33))
+        pause = asyncio.ensure_future(player.pause())
+        await asyncio.sleep(0.1)
+        # 請求被擋住等 session，但本地狀態已先更新
+        assert not volume.done() and not pause.done()
+        assert player.volume == 33 and player.paused
+
+        await asyncio.wait_for(asyncio.gather(volume, pause), 10.0)
+        assert node.resumed
+        state = fake.players[str(guild_id)]
+        assert state.volume == 33 and state.paused
+        assert player.volume == 33 and player.paused
+    finally:
+        await client.close()
+        await fake.close()
+
+
+def test_updates_during_reconnect_are_sent_after_resume():
+    asyncio.run(_updates_during_reconnect())
+
+
+async def _rapid_volume_clicks():
+    fake = FakeLavalink(FakeConfig(latency=0.05, update_interval=3600, stats_interval=3600))
+    await fake.start()
+    client = LavalinkClient(StubBot(), "127.0.0.1", fake.port, "youshallnotpass", user_id=1, idle_timeout=None, prefetch_count=0, failover_delay=None)
+    try:
+        await client.connect()
+        assert await client.node.wait_ready(timeout=5.0)
+        guild_id = 77
+        voice = client.get_voice(guild_id)
+        voice.session_id, voice.token, voice.endpoint = "sess", "token", "fake.discord.media"
+        player = client.get_player(guild_id)
+        await player.play((await client.search_tracks("clicks"))[0])
+
+        # 每次點擊都以目前的音量為基準，不等上一次的回應
+        clicks = []
+        for _ in range(10):
+            clicks.append(asyncio.ensure_future(player.set_volume(player.volume + 10)))
+            await asyncio.sleep(0.01)
+        await asyncio.wait_for(asyncio.gather(*clicks), 10.0)
+        assert player.volume == 200
+        assert fake.players[str(guild_id)].volume == 200
+    finally:
+        await client.close()
+        await fake.close()
+
+
+def test_rapid_volume_changes_accumulate():
+    asyncio.run(_rapid_volume_clicks())
+
+
+async def _held_stop_follows_move():
+    fake_a = FakeLavalink(FakeConfig(update_interval=3600, stats_interval=3600))
+    fake_b = FakeLavalink(FakeConfig(update_interval=3600, stats_interval=3600))
+    await fake_a.start()
+    await fake_b.start()
+    client = LavalinkClient(StubBot(), "127.0.0.1", fake_a.port, "youshallnotpass", user_id=1, idle_timeout=None, prefetch_count=0, failover_delay=None)
+    node_a = client.node
+    node_b = client.add_node("127.0.0.1", fake_b.port, "youshallnotpass", name="b")
+    try:
+        await client.connect()
+        assert await node_a.wait_ready(timeout=5.0) and await node_b.wait_ready(timeout=5.0)
+        node_a.ws.backoff_base = node_a.ws.backoff_cap = 30.0
+        guild_id = 55
+        client.pool.assign(guild_id, node_a)
+        voice = client.get_voice(guild_id)
+        voice.session_id, voice.token, voice.endpoint = "sess", "token", "fake.discord.media"
+        player = client.get_player(guild_id)
+        await player.play((await client.search_tracks("move"))[0])
+
+        await fake_a.close()
+        assert await _wait_for(lambda: not node_a.available)
+        stop = asyncio.ensure_future(player.stop())
+        await asyncio.sleep(0.1)
+        assert not stop.done()
+        # 搬到 B 之後，卡在 A 的 stop 要改對 B 送出，而不是讓 B 繼續播放
+        assert await client.migrate(guild_id, node_b)
+        await asyncio.wait_for(stop, 5.0)
+        assert fake_b.players[str(guild_id)].track is None
+        assert player.current is None
+    finally:
+        await client.close()
+        await fake_b.close()
+
+
+def test_held_stop_is_reissued_after_move():
+    asyncio.run(_held_stop_follows_move())
+
+
+async def _held_request_times_out(monkeypatch):
+    fake = FakeLavalink(FakeConfig(update_interval=3600, stats_interval=3600))
+    await fake.start()
+    client = LavalinkClient(StubBot(), "127.0.0.1", fake.port, "youshallnotpass", user_id=1, idle_timeout=None, prefetch_count=0, failover_delay=None)
+    node = client.node
+    try:
+        await client.connect()
+        assert await node.wait_ready(timeout=5.0)
+        node.ws.backoff_base = node.ws.backoff_cap = 30.0
+        player = client.get_player(12)
+        await fake.close()
+        assert await _wait_for(lambda: not node.available)
+        monkeypatch.setattr("CatLink.node.SESSION_TIMEOUT", 0.2)
+        assert await asyncio.wait_for(node.stop(12), 5.0) is None
+        await asyncio.wait_for(player.set_volume(40), 5.0)
+        # 逾時沒送出，本地狀態退回
+        assert player.volume == 100
+    finally:
+        await client.close()
+
+
+def test_held_request_times_out(monkeypatch):
+    asyncio.run(_held_request_times_out(monkeypatch))
+
+
+async def _v3_stale_ops_dropped():
+    fake = FakeLavalink(FakeConfig(version=3, update_interval=3600, stats_interval=3600))
+    await fake.start()
+    client = LavalinkClient(StubBot(), "127.0.0.1", fake.port, "youshallnotpass", user_id=1, version=3, idle_timeout=None, prefetch_count=0, failover_delay=None)
+    node = client.node
+    try:
+        await client.connect()
+        assert await _wait_for(lambda: node.ws is not None and node.ws.ws is not None)
+        node.ws.backoff_base = node.ws.backoff_cap = 0.3
+        player = client.get_player(9)
+        for ws in list(fake.sockets):
+            await ws.close()
+        assert await _wait_for(lambda: node.ws.ws is None)
+        await player.set_volume(33)
+        assert await _wait_for(lambda: node.ws.ws is not None and fake.sockets)
+        await asyncio.sleep(0.2)
+        # 新的 session 不應該收到給舊 session 的 op
+        assert "9" not in fake.players
+    finally:
+        await client.close()
+        await fake.close()
+
+
+def test_v3_ops_for_lost_session_are_not_replayed():
+    asyncio.run(_v3_stale_ops_dropped())
+
+
+async def _close_interrupts_backoff():
+    fake = FakeLavalink(FakeConfig(update_interval=3600, stats_interval=3600))
+    await fake.start()
+    client = LavalinkClient(StubBot(), "127.0.0.1", fake.port, "youshallnotpass", user_id=1, idle_timeout=None, prefetch_count=0, failover_delay=None)
+    node = client.node
+    await client.connect()
+    assert await node.wait_ready(timeout=5.0)
+    node.ws.backoff_base = node.ws.backoff_cap = 30.0
+    await fake.close()
+    assert await _wait_for(lambda: not node.available)
+    await client.close()
+    # 不必等完 30 秒的重連間隔
+    assert await _wait_for(lambda: node.ws.state.value == "closed", timeout=2.0)
+
+
+def test_close_interrupts_reconnect_backoff():
+    asyncio.run(_close_interrupts_backoff())
+
+
+async def _speed_and_filters():
+    fake = FakeLavalink(FakeConfig(update_interval=3600, stats_interval=3600))
+    await fake.start()
+    client = LavalinkClient(StubBot(), "127.0.0.1", fake.port, "youshallnotpass", user_id=1, idle_timeout=None, prefetch_count=0)
+    player = client.get_player(31)
+    try:
+        await client.connect()
+        assert await client.node.wait_ready(timeout=5.0)
+        try:
+            await player.set_speed(0)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("set_speed(0) should raise")
+        await player.set_filters({"volume": 0.5})
+        await player.set_speed(1.25)
+        assert player.speed == 1.25
+        assert player.filters == {"volume": 0.5, "timescale": {"speed": 1.25}}
+    finally:
+        await client.close()
+        await fake.close()
+
+
+def test_speed_is_validated_and_keeps_other_filters():
+    asyncio.run(_speed_and_filters())
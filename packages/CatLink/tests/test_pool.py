@@ -0,0 +1,44 @@
+from collections import Counter
+
+from CatLink.pool import NodePool
+from CatLink.voice import VoiceState
+
+
+class FakeNode:
+    def __init__(self, name: str, available: bool = True):
+        self.name = name
+        self.available = available
+        self.stats = None
+        self.voice_states = {}
+
+
+def test_burst_is_spread_before_stats_arrive():
+    pool = NodePool()
+    nodes = [pool.add_node(FakeNode(name)) for name in "abc"]
+    for guild_id in range(30):
+        pool.node_for(guild_id)
+    counts = Counter(pool.get_node(guild_id).name for guild_id in range(30))
+    assert counts == {node.name: 10 for node in nodes}
+
+    pool.release(0)
+    pool.assign(1, nodes[2])
+    assert [pool.penalty(node) for node in nodes] == [9, 9, 11]
+
+
+def test_guild_placed_while_all_down_moves_when_a_node_recovers():
+    pool = NodePool()
+    a = pool.add_node(FakeNode("a", available=False))
+    b = pool.add_node(FakeNode("b", available=False))
+    assert pool.node_for(1) is a
+    voice = a.voice_states[1] = VoiceState()
+    voice.synced_version = voice.version = 3
+
+    b.available = True
+    assert pool.node_for(1) is b
+    assert b.voice_states[1] is voice and 1 not in a.voice_states
+    # 換了節點，憑證要重送
+    assert voice.synced_version != voice.version
+
+    # 之後就固定在 b，不會因為 a 恢復而再搬
+    a.available = True
+    assert pool.node_for(1) is b
@@ -0,0 +1,139 @@
+import base64
+import random
+from collections import Counter
+
+import pytest
+
+from CatLink.models import Track
+from CatLink.queue import TrackQueue
+
+
+IDENTIFIERS = [f"id{i}" for i in range(12)]
+
+
+def _track(rng: random.Random) -> Track:
+    identifier = rng.choice(IDENTIFIERS)
+    return Track(
+        base64.b64encode(rng.randbytes(rng.randint(1, 40))).decode("ascii"),
+        f"title {identifier}",
+        rng.choice(["author a", "author b"]),
+        rng.randint(0, 300_000),
+        f"https://example.com/watch?v={identifier}",
+        identifier,
+        source_name="youtube",
+    )
+
+
+def _model_unshuffle(model, unshuffled):
+    # 與 TrackQueue.unshuffle 相同的規則：原本順序中還在的先排，之後加入的依目前順序接在後面
+    remaining = Counter(id(t) for t in model)
+    ordered = []
+    for source in (unshuffled, model):
+        for track in source:
+            if remaining[id(track)]:
+                ordered.append(track)
+                remaining[id(track)] -= 1
+    return ordered
+
+
+def _check(queue: TrackQueue, model, rng: random.Random):
+    assert len(queue) == len(model)
+    assert bool(queue) == bool(model)
+    assert list(queue) == model
+    assert queue._counts == Counter(t.identifier for t in model)
+    if model:
+        i = rng.randrange(-len(model), len(model))
+        assert queue[i] == model[i]
+        probe = rng.choice(model)
+        assert probe in queue
+        assert queue.index(probe) == model.index(probe)
+        assert queue.count(probe) == sum(t.identifier == probe.identifier for t in model)
+    a, b = sorted(rng.randint(-5, len(model) + 5) for _ in range(2))
+    assert queue[a:b] == model[a:b]
+    # window 是分頁用的，只接受非負的索引
+    a, b = max(0, a), max(0, b)
+    assert queue.window(a, b) == model[a:b]
+    step = rng.choice([2, 3, -1])
+    assert queue[::step] == model[::step]
+
+
+@pytest.mark.parametrize("compact", [False, True])
+@pytest.mark.parametrize("seed", range(6))
+def test_queue_matches_list(monkeypatch, compact, seed):
+    # 小的塊讓分塊、拆塊與 Fenwick tree 重建在少量操作內就會發生
+    monkeypatch.setattr(TrackQueue, "_LOAD", 4)
+    rng = random.Random(seed)
+    shuffle_seed = rng.random()
+    queue_rng, model_rng = random.Random(shuffle_seed), random.Random(shuffle_seed)
+    queue = TrackQueue(compact=compact)
+    model = []
+    unshuffled = None
+
+    for _ in range(1500):
+        op = rng.random()
+        if op < 0.25:
+            track = _track(rng)
+            queue.append(track)
+            model.append(track)
+        elif op < 0.35:
+            track = _track(rng)
+            queue.appendleft(track)
+            model.insert(0, track)
+        elif op < 0.55:
+            track = _track(rng)
+            index = rng.randint(-len(model) - 3, len(model) + 3)
+            queue.insert(index, track)
+            model.insert(index, track)
+        elif op < 0.70 and model:
+            index = rng.randrange(-len(model), len(model))
+            assert queue.pop(index) == model.pop(index)
+        elif op < 0.75 and model:
+            assert queue.popleft() == model.pop(0)
+        elif op < 0.80 and model:
+            index = rng.randrange(len(model))
+            del queue[index]
+            del model[index]
+        elif op < 0.85 and model:
+            index = rng.randrange(len(model))
+            track = _track(rng)
+            queue[index] = track
+            model[index] = track
+        elif op < 0.89 and model:
+            src, dst = rng.randrange(len(model)), rng.randrange(len(model))
+            queue.move(src, dst)
+            model.insert(dst, model.pop(src))
+        elif op < 0.92 and model:
+            track = rng.choice(model)
+            queue.remove(track)
+            model.remove(track)
+        elif op < 0.96:
+            queue.shuffle(queue_rng)
+            if unshuffled is None:
+                unshuffled = list(model)
+            model_rng.shuffle(model)
+        elif op < 0.995:
+            queue.unshuffle()
+            if unshuffled is not None:
+                model = _model_unshuffle(model, unshuffled)
+                unshuffled = None
+        else:
+            queue.clear()
+            model = []
+            unshuffled = None
+        assert queue.is_shuffled == (unshuffled is not None)
+        _check(queue, model, rng)
+
+    with pytest.raises(IndexError):
+        queue[len(model)]
+    with pytest.raises(ValueError):
+        queue.index(_track(rng))
+
+
+@pytest.mark.parametrize("encoded", ["not base64!!", "QUJD", "QUJDRA", "QUJ DRA=="])
+def test_compact_queue_keeps_tracks_with_non_canonical_base64(encoded):
+    # 轉成 bytes 再轉回來會跟原本不同的，原樣保存，不會讓 append 失敗
+    track = Track(encoded, "title", "author", 1, "https://example.com/x", "x")
+    queue = TrackQueue(compact=True)
+    queue.append(track)
+    assert queue[0] == track
+    assert queue[0].encoded == encoded
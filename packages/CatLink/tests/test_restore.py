@@ -0,0 +1,56 @@
+import asyncio
+
+from CatLink import LavalinkClient
+from CatLink.models import LazyTrack
+from CatLink.session_store import SessionStore
+
+from fake_lavalink import FakeConfig, FakeLavalink
+from test_node_restart import StubBot, _wait_for
+
+
+class MemoryStore(SessionStore):
+    def __init__(self, data):
+        self.data = data
+
+    async def load(self):
+        return self.data
+
+    async def save(self, data):
+        self.data = data
+
+
+async def _restore_into_existing_player():
+    fake = FakeLavalink(FakeConfig(update_interval=3600, stats_interval=3600))
+    await fake.start()
+    name = f"127.0.0.1:{fake.port}"
+    store = MemoryStore({
+        "sessions": {name: fake.session_id},
+        "players": {
+            "5": {
+                "node": name,
+                "current": None,
+                "volume": 70,
+                "queue": [{"bogus": 1}, {"query": "saved"}, "not-a-track", {"query": "also saved", "title": "Also"}],
+                "voice": None,
+            },
+        },
+    })
+    client = LavalinkClient(StubBot(), "127.0.0.1", fake.port, "youshallnotpass", user_id=1, idle_timeout=None, prefetch_count=0, session_store=store)
+    # 節點 ready 之前就建立的 player
+    player = client.get_player(5)
+    player.queue.append(LazyTrack(query="added later"))
+    try:
+        await client.connect()
+        assert await client.node.wait_ready(timeout=5.0)
+        assert await _wait_for(lambda: len(player.queue) == 3)
+        # 壞掉的項目被跳過，保存的佇列排在之後加入的歌前面
+        assert [entry.title for entry in player.queue] == ["saved", "Also", "added later"]
+        assert player.volume == 70
+        assert client.players[5] is player
+    finally:
+        await client.close()
+        await fake.close()
+
+
+def test_saved_state_merges_into_player_created_before_ready():
+    asyncio.run(_restore_into_existing_player())